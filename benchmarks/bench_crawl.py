@@ -0,0 +1,62 @@
+"""
+Benchmark for crawl mode against a local http.server fixture
+
+Serves a synthetic site where every page links to a few child pages and a
+few MP3 files, with a fixed delay per request to stand in for network
+latency. The same site is then crawled serially (one worker) and
+concurrently, and the timings are compared.
+
+Usage:
+    python benchmarks/bench_crawl.py [--pages 200] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import FixtureServer, make_handler, player  # noqa: E402
+
+def depth_for(pages, fanout):
+    depth, reachable, level = 0, 1, 1
+    while reachable < pages:
+        level *= fanout
+        reachable += level
+        depth += 1
+    return depth
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200, help='Number of pages on the site')
+    parser.add_argument('--fanout', type=int, default=4, help='Child pages linked from each page')
+    parser.add_argument('--tracks', type=int, default=5, help='MP3 links on each page')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server delay per request in seconds')
+    args = parser.parse_args()
+
+    # The bench_suite fixture as a site: pages linking to child pages, with no padding or tracks served
+    args.links, args.page_kb, args.track_kb, args.bandwidth = args.tracks, 0, 0, 0
+    server = FixtureServer(('127.0.0.1', 0), make_handler(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f'http://127.0.0.1:{server.server_address[1]}/page/0'
+    os.chdir(tempfile.mkdtemp())  # Keeps fixture pages out of the real page_cache.json
+    depth = depth_for(args.pages, args.fanout)
+
+    try:
+        results = {}
+        for label, workers in (('serial', 1), ('concurrent', player.CRAWL_WORKERS)):
+            started = time.perf_counter()
+            mp3_urls = player.crawl_mp3_urls(start_url, max_depth=depth, max_pages=args.pages,
+                                             max_workers=workers,
+                                             per_host_limit=min(workers, player.CRAWL_PER_HOST))
+            elapsed = time.perf_counter() - started
+            results[label] = elapsed
+            print(f"{label:>10}: {len(mp3_urls)} tracks from {args.pages} pages in {elapsed:.2f}s")
+        print(f"{'speedup':>10}: {results['serial'] / results['concurrent']:.1f}x")
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
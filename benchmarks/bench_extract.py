@@ -0,0 +1,119 @@
+"""
+Equivalence check and benchmark for the streaming MP3 extractor
+
+Builds a corpus of synthetic pages covering every kind of MP3 candidate
+(anchors, <source> tags, inline scripts, data-song attributes, entities,
+relative links, a multi-megabyte directory listing and a huge inline
+script). Each page is run through the original BeautifulSoup-based
+extraction and through the single-pass streaming extractor. Every URL the
+original finds must be found, in canonical form; the streaming extractor
+also finds signed links, relative URLs in scripts and other audio formats,
+which are counted as "new". Parse time and peak traced memory are
+reported for both.
+
+Usage:
+    python benchmarks/bench_extract.py [--listing-entries 50000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+from urllib.parse import urljoin
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import player  # noqa: E402
+
+BASE_URL = 'http://music.example.com/albums/index.html'
+
+def reference_extract(html, url):
+    """The four find_all sweeps scrape_mp3_urls used before the streaming extractor"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    mp3_urls = []
+    for link in soup.find_all('a', href=True):
+        full_url = urljoin(url, link['href'])
+        if full_url.lower().endswith('.mp3'):
+            mp3_urls.append(full_url)
+    for source in soup.find_all('source'):
+        if source.get('src'):
+            full_url = urljoin(url, source['src'])
+            if full_url.lower().endswith('.mp3'):
+                mp3_urls.append(full_url)
+    for script in soup.find_all('script'):
+        if script.string:
+            mp3_urls.extend(re.findall(r'https?://[^\s<>"\']+?\.mp3', script.string))
+    for tag in soup.find_all(attrs={'data-song': True}):
+        full_url = urljoin(url, tag['data-song'])
+        if full_url.lower().endswith('.mp3'):
+            mp3_urls.append(full_url)
+    return set(mp3_urls)
+
+def build_corpus(listing_entries):
+    corpus = {
+        'anchors': '<html><body><a href="/a/one.mp3">One</a><a href="two.MP3">Two</a>'
+                   '<a href="http://cdn.example.com/three.mp3">Three</a><a href="/page2">Next</a>'
+                   '<a href="x.mp3#frag">Fragment</a><a>No href</a></body></html>',
+        'sources': '<audio><source src="/s/1.mp3" type="audio/mpeg"><source src="">'
+                   '<source src="/s/2.ogg"></audio><video><source src="s/3.mp3"/></video>',
+        'scripts': '<script>var list = ["https://cdn.example.com/x.mp3", \'http://a.b/y.mp3\'];'
+                   'if (a < b) { document.write("</div>"); }</script>'
+                   '<script type="application/json">{"u": "https://j.example.com/z.mp3"}</script>'
+                   '<script src="/app.js"></script>',
+        'signed/relative': '<a href="/sig/1.mp3?token=abc&amp;exp=9">Signed</a>'
+                           '<script>var t = {"src": "media\\/2.mp3", "alt": "/3.ogg?v=1"};</script>'
+                           '<div data-player=\'{"tracks": [{"file": "4.flac"}]}\'></div>',
+        'data-song': '<span data-song="/d/1.mp3"></span><div data-song="https://d.example.com/2.mp3">'
+                     '</div><li data-song="/d/3.wav"></li><a href="/d/4.mp3" data-song="/d/5.mp3">x</a>',
+        'entities': '<a href="/e/rock&amp;roll.mp3">R&amp;R</a><a href="/e/caf&eacute;.mp3">Cafe</a>'
+                    '<a href="/e/space%20name.mp3">Space</a>',
+        'unclosed': '<html><body><p>Broken <a href="/u/1.mp3">one<div><a href=/u/2.mp3>two'
+                    '<script>var t = "http://u.example.com/3.mp3";',
+    }
+    rows = ''.join(f'<tr><td><a href="/listing/track_{i:06d}.mp3">track_{i:06d}.mp3</a></td>'
+                   f'<td>{i * 3} KB</td></tr>\n' for i in range(listing_entries))
+    corpus['directory listing'] = f'<html><body><table>{rows}</table></body></html>'
+    urls = ''.join(f'"https://cdn.example.com/js/{i}.mp3",\n' for i in range(listing_entries // 2))
+    corpus['huge script'] = f'<html><script>var tracks = [{urls}];</script></html>'
+    return corpus
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listing-entries', type=int, default=50000,
+                        help='Rows in the synthetic directory listing page')
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'page':<18} {'size':>9} {'urls':>7} {'new':>5} {'bs4 s':>8} {'bs4 MB':>8} {'stream s':>9} {'stream MB':>10}")
+    for name, html in build_corpus(args.listing_entries).items():
+        body = html.encode('utf-8')
+        chunks = [body[i:i + player.STREAM_CHUNK_SIZE]
+                  for i in range(0, len(body), player.STREAM_CHUNK_SIZE)]
+        expected, ref_time, ref_peak = measure(lambda: reference_extract(html, BASE_URL))
+        (found, _), time_taken, peak = measure(
+            lambda: player.parse_stream(iter(chunks), BASE_URL, 'text/html; charset=utf-8'))
+        expected = {player.canonical_url(url) for url in expected}
+        missing = expected - set(found)
+        status = 'ok' if not missing else 'MISMATCH'
+        if missing:
+            failures += 1
+            print(f"  missing: {sorted(missing)[:5]}")
+        new = len(set(found) - expected)
+        print(f"{name:<18} {len(body):>9} {len(found):>7} {new:>5} {ref_time:>8.3f} {ref_peak / 2**20:>8.1f} "
+              f"{time_taken:>9.3f} {peak / 2**20:>10.1f}  {status}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Cold-start import time of the headless scraping path
+
+Starts a fresh interpreter for every run, so nothing is cached in
+sys.modules between samples, and times `import player` and a full
+`player.py --help` run. Also checks that no GUI or audio module was
+loaded, and lists the slowest imports from `python -X importtime`.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+GUI_MODULES = ('tkinter', 'pygame', 'PIL', 'bs4')
+
+def time_command(args, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), min(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='Interpreter starts per measurement')
+    args = parser.parse_args()
+
+    check = ("import sys, player; "
+             f"print(','.join(m for m in {GUI_MODULES!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, '-c', check], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout.strip()
+    print(f"GUI/audio modules loaded by 'import player': {loaded or 'none'}")
+
+    for label, command in (('python -c pass', [sys.executable, '-c', 'pass']),
+                           ('import player', [sys.executable, '-c', 'import player']),
+                           ('player.py --help', [sys.executable, 'player.py', '--help'])):
+        median, best = time_command(command, args.runs)
+        print(f"{label:<18} median {median * 1000:7.1f} ms   best {best * 1000:7.1f} ms")
+
+    # -X importtime writes "self | cumulative | module" lines to stderr
+    report = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import player'], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in report.splitlines()[1:]:
+        parts = line.split('|')
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2 if len(parts) == 3 else -1
+        if depth == 1:  # Modules imported directly by a top-level import
+            rows.append((int(parts[1].split(':')[-1]), parts[2].strip()))
+    print("\nSlowest imports made by top-level modules (cumulative):")
+    for micros, module in sorted(rows, reverse=True)[:8]:
+        print(f"  {micros / 1000:7.1f} ms  {module}")
+
+    if loaded:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
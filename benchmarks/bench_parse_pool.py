@@ -0,0 +1,67 @@
+"""
+Scaling of the crawl's process-pool parse stage with the number of cores
+
+Serves a synthetic site of large pages (a list of thousands of MP3 links
+each) from the http.server fixture of bench_suite.py with no added latency,
+so parsing rather than the network is the bottleneck. The same site is
+crawled with 1, 2, 4, ... parse processes up to the number of cores; every
+run must find the same URLs in the same order.
+
+Usage:
+    python benchmarks/bench_parse_pool.py [--pages 64] [--links 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import FixtureServer, make_handler, player  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=64, help='Number of pages on the site')
+    parser.add_argument('--links', type=int, default=20000, help='MP3 links on each page')
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count() or 1,
+                        help='Largest number of parse processes to try')
+    args = parser.parse_args()
+
+    # The start page links to every other page; nothing is padded and no tracks are served
+    args.fanout, args.page_kb, args.track_kb, args.latency, args.bandwidth = args.pages - 1, 0, 0, 0, 0
+    server = FixtureServer(('127.0.0.1', 0), make_handler(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f'http://127.0.0.1:{server.server_address[1]}/page/0'
+    os.chdir(tempfile.mkdtemp())  # Keeps fixture pages out of the real page_cache.json
+    counts = [1]
+    while counts[-1] * 2 <= args.max_processes:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_processes:
+        counts.append(args.max_processes)
+
+    try:
+        expected = baseline = None
+        failures = 0
+        for processes in counts:
+            if os.path.exists(player.PAGE_CACHE_FILE):
+                os.remove(player.PAGE_CACHE_FILE)  # Every run must fetch and parse every page
+            started = time.perf_counter()
+            mp3_urls = player.crawl_mp3_urls(start_url, max_depth=1, max_pages=args.pages,
+                                             parse_processes=processes)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            expected = expected or mp3_urls
+            status = 'ok' if mp3_urls == expected else 'MISMATCH'
+            failures += status != 'ok'
+            print(f"{processes:>3} processes: {len(mp3_urls)} tracks in {elapsed:.2f}s "
+                  f"({args.pages / elapsed:.1f} pages/s, {baseline / elapsed:.1f}x)  {status}")
+    finally:
+        server.shutdown()
+        if os.path.exists(player.PAGE_CACHE_FILE):
+            os.remove(player.PAGE_CACHE_FILE)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
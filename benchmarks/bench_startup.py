@@ -0,0 +1,74 @@
+"""
+Cold-start time of the GUI windows
+
+Starts a fresh interpreter for every run and times how long it takes until
+the URL window, and then the player window with a long playlist, is on
+screen. Each window closes itself as soon as it is visible. Also reports
+which heavy modules had been imported by then; requests, pygame and PIL
+should all wait until they are needed.
+
+Needs a display (on a server, run it under xvfb-run). The first run is not
+counted, because it creates the resized button images.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--tracks 5000]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ('requests', 'pygame', 'PIL', 'bs4')
+TARGET_MS = 150  # Budget for the URL window
+
+def window_script(window, tracks):
+    if window == 'url':
+        open_window = "player.create_url_input_ui(exit_when_shown=True)"
+    else:
+        open_window = (f"player.create_player_ui([f'http://127.0.0.1:9/album/track_{{i:05d}}.mp3' "
+                       f"for i in range({tracks})], exit_when_shown=True)")
+    return ("import sys, player; " + open_window + "; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+def time_window(script):
+    """Seconds from starting the interpreter until the window is shown, and the modules loaded"""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT, text=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    shown = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    loaded = process.stdout.readline().strip()
+    _, errors = process.communicate()
+    if 'shown' not in shown:
+        raise RuntimeError(f"The window didn't open: {errors.strip().splitlines()[-1:]}")
+    return elapsed, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Interpreter starts per window')
+    parser.add_argument('--tracks', type=int, default=5000, help='Tracks in the player window playlist')
+    args = parser.parse_args()
+
+    env_display = os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')
+    if not env_display and sys.platform.startswith('linux'):
+        sys.exit("No display found; try: xvfb-run python benchmarks/bench_startup.py")
+
+    url_median = None
+    for window in ('url', 'player'):
+        script = window_script(window, args.tracks)
+        _, loaded = time_window(script)  # Builds the image cache
+        samples = [time_window(script)[0] for _ in range(args.runs)]
+        median = statistics.median(samples)
+        url_median = url_median or median
+        print(f"{window + ' window':<14} median {median * 1000:7.1f} ms   best {min(samples) * 1000:7.1f} ms"
+              f"   loaded: {loaded or 'none'}")
+
+    if url_median * 1000 > TARGET_MS:
+        print(f"URL window is over the {TARGET_MS} ms budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
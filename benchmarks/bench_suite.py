@@ -0,0 +1,278 @@
+"""
+Offline benchmark suite for scraping, parsing and playback start-up
+
+Serves synthetic HTML pages and MP3 files from a local http.server fixture,
+with configurable link counts, page sizes, per-request latency and a
+bandwidth limit, then measures:
+
+    parse        parse_stream() on an in-memory page (no network)
+    scrape       scrape_mp3_urls() over many pages, in pages/s and MB/s
+    track_names  get_track_names() on --names URLs taken from a scraped page
+    first_sound  time from picking a track until mixer.music.play() returns
+    skip         time to start the next (prefetched) and a distant (cold) track
+
+Every stage runs in its own interpreter, in a scratch directory, so the
+peak RSS reported for it is its own and no cache is shared between
+stages. Results are written as JSON, and --compare prints the change
+against an earlier results file.
+
+Usage:
+    python benchmarks/bench_suite.py [--links 2000] [--latency 0.02] [--bandwidth 0]
+                                     [--output results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')  # Play into the void on machines without a sound card
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import player  # noqa: E402
+
+STAGES = ('parse', 'scrape', 'track_names', 'first_sound', 'skip')
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of silence
+MP3_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+SEND_SLICE = 16 * 1024  # Bytes written between bandwidth-limit sleeps
+
+def build_page(page, links, page_kb, fanout=0, pages=0):
+    """
+    HTML page with `links` MP3 anchors, padded with prose to about page_kb KB
+
+    With a fanout, page N also links to pages N * fanout + 1 to N * fanout + fanout
+    that are below `pages`, which makes the fixture a site that can be crawled.
+    """
+    children = range(page * fanout + 1, min(page * fanout + fanout + 1, pages))
+    nav = ''.join(f'<a href="/page/{child}">Page {child}</a>\n' for child in children)
+    rows = ''.join(f'<li><a href="/audio/p{page}/Artist_{i % 97} - Song_{i:05d}.mp3">Song {i}</a></li>\n'
+                   for i in range(links))
+    body = f'<html><head><title>Page {page}</title></head><body>{nav}<ul>{rows}</ul>'
+    padding = max(0, page_kb * 1024 - len(body))
+    body += '<p>' + ('lorem ipsum dolor sit amet ' * (padding // 27 + 1))[:padding] + '</p></body></html>'
+    return body.encode()
+
+def make_handler(args):
+    pages = {}
+    track = MP3_FRAME * (args.track_kb * 1024 // len(MP3_FRAME))
+    fanout = getattr(args, 'fanout', 0)  # Set by the crawl benchmarks, which need linked pages
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(args.latency)
+            if self.path.startswith('/page/'):
+                page = int(self.path.rsplit('/', 1)[1])
+                if page not in pages:
+                    pages[page] = build_page(page, args.links, args.page_kb, fanout, args.pages)
+                body, content_type = pages[page], 'text/html; charset=utf-8'
+            elif self.path.startswith('/audio/'):
+                body, content_type = track, 'audio/mpeg'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                for start in range(0, len(body), SEND_SLICE):
+                    self.wfile.write(body[start:start + SEND_SLICE])
+                    if args.bandwidth:
+                        time.sleep(SEND_SLICE / (args.bandwidth * 1024))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client cancelled the download
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Idle keep-alive connections are reset when a stage's process exits
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / 2**20 if sys.platform == 'darwin' else peak / 1024, 1)
+
+def track_urls(server, count):
+    return [f'{server}/audio/p0/Artist_{i % 97} - Song_{i:05d}.mp3' for i in range(count)]
+
+def stage_parse(args, server):
+    body = build_page(0, args.links, args.page_kb)
+    chunks = [body[i:i + player.STREAM_CHUNK_SIZE] for i in range(0, len(body), player.STREAM_CHUNK_SIZE)]
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        mp3_urls, _ = player.parse_stream(iter(chunks), f'{server}/page/0', 'text/html; charset=utf-8')
+        samples.append(time.perf_counter() - started)
+    best = min(samples)
+    return {'seconds': round(best, 4), 'mb_per_s': round(len(body) / 2**20 / best, 1),
+            'page_bytes': len(body), 'urls': len(mp3_urls)}
+
+def stage_scrape(args, server):
+    started = time.perf_counter()
+    found = 0
+    for page in range(args.pages):
+        found += len(player.scrape_mp3_urls(f'{server}/page/{page}'))
+    elapsed = time.perf_counter() - started
+    page_bytes = len(build_page(0, args.links, args.page_kb))
+    return {'seconds': round(elapsed, 3), 'pages_per_s': round(args.pages / elapsed, 1),
+            'mb_per_s': round(args.pages * page_bytes / 2**20 / elapsed, 2), 'urls': found}
+
+def stage_track_names(args, server):
+    mp3_urls = player.scrape_mp3_urls(f'{server}/page/0')
+    mp3_urls = (mp3_urls * (args.names // max(len(mp3_urls), 1) + 1))[:args.names]
+    started = time.perf_counter()
+    names = player.get_track_names(mp3_urls)
+    elapsed = time.perf_counter() - started
+    return {'seconds': round(elapsed, 4), 'names': len(names),
+            'names_per_s': round(len(names) / elapsed)}
+
+def start_track(prefetcher, mixer, index):
+    """The player's path from picking a track to hearing it, minus the Tk event loop"""
+    prefetcher.schedule(index)
+    stream = prefetcher.fetch(index)
+    if stream:
+        while stream.wait_for(player.PLAYBACK_BUFFER_BYTES, timeout=0.1) < player.PLAYBACK_BUFFER_BYTES:
+            if stream.finished.is_set():
+                break
+        if stream.error:
+            raise stream.error
+    if mixer:
+        mixer.music.load(prefetcher.path_for(index))
+        mixer.music.play()
+
+def open_player(server, args):
+    try:
+        from pygame import mixer
+        mixer.init()
+    except Exception as e:
+        print(f"Audio unavailable, timing downloads only: {e}", file=sys.stderr)
+        mixer = None
+    prefetcher = player.TrackPrefetcher(track_urls(server, args.tracks), tempfile.mkdtemp())
+    return prefetcher, mixer
+
+def stage_first_sound(args, server):
+    prefetcher, mixer = open_player(server, args)
+    try:
+        started = time.perf_counter()
+        start_track(prefetcher, mixer, 0)
+        return {'seconds': round(time.perf_counter() - started, 4), 'audio': mixer is not None,
+                'buffer_bytes': player.PLAYBACK_BUFFER_BYTES}
+    finally:
+        prefetcher.stop()
+
+def stage_skip(args, server):
+    prefetcher, mixer = open_player(server, args)
+    try:
+        start_track(prefetcher, mixer, 0)
+        time.sleep(args.settle)  # Listening to the first track while the next ones prefetch
+        started = time.perf_counter()
+        start_track(prefetcher, mixer, 1)
+        next_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        start_track(prefetcher, mixer, args.tracks - 1)
+        far_seconds = time.perf_counter() - started
+        return {'next_seconds': round(next_seconds, 4), 'far_seconds': round(far_seconds, 4),
+                'audio': mixer is not None}
+    finally:
+        prefetcher.stop()
+
+def run_stage(args):
+    """Child process: run one stage in a scratch directory and print its result as JSON"""
+    os.chdir(tempfile.mkdtemp())  # Keeps page_cache.json and friends out of the repo
+    result = globals()[f'stage_{args.stage}'](args, args.server)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    print(f"\nChange against {baseline.get('revision') or 'baseline'}:", file=sys.stderr)
+    for stage, metrics in results['stages'].items():
+        old = baseline.get('stages', {}).get(stage, {})
+        for metric, value in metrics.items():
+            before = old.get(metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and before:
+                print(f"  {stage + '.' + metric:<28} {before:>12} -> {value:<12} ({value / before:.2f}x)",
+                      file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--links', type=int, default=2000, help='MP3 links on each page')
+    parser.add_argument('--page-kb', type=int, default=256, help='Size each page is padded to, in KB')
+    parser.add_argument('--pages', type=int, default=20, help='Pages fetched by the scrape stage')
+    parser.add_argument('--names', type=int, default=100000, help='URLs named by the track_names stage')
+    parser.add_argument('--tracks', type=int, default=20, help='Tracks in the playlist of the playback stages')
+    parser.add_argument('--track-kb', type=int, default=4096, help='Size of each MP3 file, in KB')
+    parser.add_argument('--latency', type=float, default=0.02, help='Server delay per request in seconds')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Per-connection limit in KB/s (0: unlimited)')
+    parser.add_argument('--settle', type=float, default=1.0, help='Seconds of prefetching before the skip')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of the parse stage (best is kept)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Comma-separated stages to run')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', metavar='FILE', help='Earlier results to compare against')
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args)
+        return
+
+    server = FixtureServer(('127.0.0.1', 0), make_handler(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    params = {name: getattr(args, name) for name in ('links', 'page_kb', 'pages', 'names', 'tracks',
+                                                       'track_kb', 'latency', 'bandwidth', 'settle', 'repeat')}
+    results = {'revision': git_revision(), 'date': datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'platform': platform.platform(),
+               'params': params, 'stages': {}}
+    child_args = [f'--{name.replace("_", "-")}={value}' for name, value in params.items()]
+    try:
+        for stage in args.stages.split(','):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--stage', stage,
+                                     '--server', server_url, *child_args],
+                                    check=True, capture_output=True, text=True).stdout
+            results['stages'][stage] = json.loads(output.strip().splitlines()[-1])
+            print(f"{stage:<12} {results['stages'][stage]}", file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
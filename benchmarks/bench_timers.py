@@ -0,0 +1,221 @@
+"""
+Stress test: rapid seeks, skips and play/pause keep a single progress clock
+
+Runs the player window without a display, against MP3 files from the local
+http.server fixture of bench_suite.py. tkinter is swapped for a stand-in
+whose root.after() keeps its own job list, so every pending progress tick
+can be counted. A seeded random sequence of seeks, skips and play/pause
+presses is then fired at the window, some faster than the clock ticks,
+while downloads are still streaming in.
+
+The progress clock must never have more than one tick pending; two would
+mean a duplicate timer chain, with the UI updated twice as often for every
+extra chain. The script exits with status 1 if that happens, or if playback
+ends up with no clock running at all.
+
+Usage:
+    python benchmarks/bench_timers.py [--actions 200] [--tracks 20] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import FixtureServer, make_handler, player, track_urls  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TICK = 'progress_tick'  # Name of the player's progress clock callback
+
+class FakeWidget:
+    """Accepts any options and method calls, remembering commands and bindings"""
+    registry = {}  # Command or event name -> callback, for the driver
+
+    def __init__(self, *args, **options):
+        self.options = options
+        if callable(options.get('command')):
+            FakeWidget.registry[options['command'].__name__] = options['command']
+        if 'variable' in options:
+            FakeWidget.registry['seek_variable'] = options['variable']
+
+    def bind(self, sequence, callback):
+        FakeWidget.registry[sequence] = callback
+
+    def curselection(self):
+        return ()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class FakeVar:
+    def __init__(self, master=None, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def trace_add(self, mode, callback):
+        pass
+
+class FakeTk(FakeWidget):
+    """Root window with an after() queue that is run by mainloop() in real time"""
+    scenario = None  # Called with the root when mainloop() starts
+
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.jobs = {}  # Job id -> (due time, callback, args)
+        self.job_count = 0
+        self.destroyed = False
+        self.max_ticks_pending = 0
+        self.ticks_run = 0
+
+    def protocol(self, name, callback):
+        FakeWidget.registry[name] = callback
+
+    def after(self, ms, callback, *args):
+        self.job_count += 1
+        job = f'after#{self.job_count}'
+        self.jobs[job] = (time.monotonic() + ms / 1000, callback, args)
+        return job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def ticks_pending(self):
+        return sum(1 for _, callback, _ in self.jobs.values() if getattr(callback, '__name__', '') == TICK)
+
+    def mainloop(self):
+        FakeTk.scenario(self)
+        while not self.destroyed:
+            now = time.monotonic()
+            due = sorted((item for item in self.jobs.items() if item[1][0] <= now), key=lambda item: item[1][0])
+            if not due:
+                time.sleep(0.001)
+                continue
+            job, (_, callback, args) = due[0]
+            del self.jobs[job]
+            if getattr(callback, '__name__', '') == TICK:
+                self.ticks_run += 1
+            callback(*args)
+            self.max_ticks_pending = max(self.max_ticks_pending, self.ticks_pending())
+
+    def destroy(self):
+        self.destroyed = True
+
+def fake_tkinter():
+    """Module objects standing in for tkinter, tkinter.ttk and tkinter.filedialog"""
+    tk = types.ModuleType('tkinter')
+    ttk = types.ModuleType('tkinter.ttk')
+    filedialog = types.ModuleType('tkinter.filedialog')
+    tk.Tk = FakeTk
+    tk.StringVar = tk.DoubleVar = tk.BooleanVar = tk.IntVar = FakeVar
+    for name in ('Button', 'Listbox', 'PhotoImage', 'Checkbutton', 'Entry', 'Label', 'Frame'):
+        setattr(tk, name, FakeWidget)
+    for name in ('Frame', 'Label', 'Button', 'Entry', 'Scale', 'Scrollbar', 'Checkbutton'):
+        setattr(ttk, name, FakeWidget)
+    for name in ('LEFT', 'RIGHT', 'BOTH', 'X', 'Y', 'W', 'E', 'END', 'HORIZONTAL', 'SINGLE'):
+        setattr(tk, name, name.lower())
+    filedialog.askdirectory = lambda **options: ''
+    tk.ttk, tk.filedialog = ttk, filedialog
+    return {'tkinter': tk, 'tkinter.ttk': ttk, 'tkinter.filedialog': filedialog}
+
+def make_scenario(args, results):
+    rng = random.Random(args.seed)
+    actions = ('play_pause', 'next_track', 'prev_track', 'seek', 'seek')
+
+    def scenario(root):
+        commands = FakeWidget.registry
+        commands['play_pause']()
+        step = 0
+
+        def act():
+            nonlocal step
+            action = rng.choice(actions)
+            if action == 'seek':
+                commands['<ButtonPress-1>'](None)
+                commands['seek_variable'].set(rng.uniform(0, 30))
+                commands['<ButtonRelease-1>'](None)
+            else:
+                commands[action]()
+            results['actions'][action] = results['actions'].get(action, 0) + 1
+            results['max_pending'] = max(results['max_pending'], root.ticks_pending())
+            step += 1
+            if step < args.actions:
+                root.after(rng.randint(0, args.max_gap_ms), act)
+            else:
+                if not is_playing(commands['play_pause']):
+                    commands['play_pause']()  # End up playing, so a clock must be running
+                root.after(int(args.settle * 1000), finish)
+
+        def finish():
+            results['pending_at_end'] = root.ticks_pending()
+            results['max_pending'] = max(results['max_pending'], root.max_ticks_pending)
+            results['ticks_run'] = root.ticks_run
+            results['playing_at_end'] = is_playing(commands['play_pause'])
+            commands['WM_DELETE_WINDOW']()
+
+        root.after(args.max_gap_ms, act)
+
+    return scenario
+
+def is_playing(play_pause):
+    """The player's is_playing flag, read from the play/pause handler's closure"""
+    names = play_pause.__code__.co_freevars
+    return play_pause.__closure__[names.index('is_playing')].cell_contents
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--actions', type=int, default=200, help='Seeks, skips and presses to fire')
+    parser.add_argument('--max-gap-ms', type=int, default=250, help='Longest pause between two actions')
+    parser.add_argument('--settle', type=float, default=1.0, help='Seconds to let playback run at the end')
+    parser.add_argument('--tracks', type=int, default=20, help='Tracks in the playlist')
+    parser.add_argument('--track-kb', type=int, default=512, help='Size of each MP3 file in KB')
+    parser.add_argument('--bandwidth', type=int, default=4000, help='Fixture bandwidth in KB/s, 0 for unlimited')
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds of delay before each response')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the random action sequence')
+    args = parser.parse_args()
+    args.links, args.page_kb = 0, 0  # No pages are served
+
+    server = FixtureServer(('127.0.0.1', 0), make_handler(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scratch = tempfile.mkdtemp()
+    os.symlink(os.path.abspath(os.path.join(ROOT, 'images')), os.path.join(scratch, 'images'))
+    # The library, page and link caches and button images are kept relative to the working directory
+    os.chdir(scratch)
+    # Never fill the user's audio cache with fixture tracks, whatever its default location
+    player.AUDIO_CACHE_DIR = os.path.join(scratch, 'audio_cache')
+
+    results = {'actions': {}, 'max_pending': 0}
+    FakeTk.scenario = make_scenario(args, results)
+    sys.modules.update(fake_tkinter())
+    started = time.perf_counter()
+    try:
+        player.create_player_ui(track_urls(f'http://127.0.0.1:{server.server_address[1]}', args.tracks),
+                                track_info={})
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - started
+
+    done = ', '.join(f"{count} {action}" for action, count in sorted(results['actions'].items()))
+    print(f"{sum(results['actions'].values())} actions in {elapsed:.1f}s ({done})")
+    print(f"progress ticks run: {results.get('ticks_run', 0)}, most pending at once: {results['max_pending']}, "
+          f"pending at the end: {results.get('pending_at_end')}")
+    failed = results['max_pending'] > 1
+    if results.get('playing_at_end') and results.get('pending_at_end') != 1:
+        failed = True
+        print("Playback ended up without exactly one progress clock")
+    if results['max_pending'] > 1:
+        print("Duplicate progress timer chains")
+    print('FAILED' if failed else 'ok')
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
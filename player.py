@@ -1,141 +1,3055 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from html.parser import HTMLParser
+import codecs
+from xml.etree import ElementTree
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, quote, unquote
 import re
-import tkinter as tk
-from tkinter import ttk, messagebox
-from pygame import mixer
-from urllib.request import urlretrieve
 import os
 import tempfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import json
+import sqlite3
+import queue
+import hashlib
+import itertools
+import shutil
+import time
+import random
+import bisect
+import array
+import mmap
+import struct
 from datetime import datetime
-from PIL import Image, ImageTk
+import argparse
+import contextlib
+import functools
+import importlib
+import atexit
+import sys
+
+# tkinter, pygame and PIL are imported inside the UI functions, so the
+# scraping and download code can be used without a display or audio device
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when one of its attributes is used
+    
+    Importing requests takes longer than opening the first window, and no
+    request is made before the user has typed a URL.
+    """
+    def __init__(self, name):
+        self.__name = name
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name)
+        # Copying the module's namespace means this only runs for the first lookup
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+requests = LazyModule('requests')
+
+# Network settings shared by the scraper and the crawler
+REQUEST_TIMEOUT = 15  # Seconds to wait for a server before giving up
+CRAWL_MAX_DEPTH = 2  # How many links away from the start page to follow
+CRAWL_MAX_PAGES = 200  # Upper bound on the number of pages fetched per crawl
+CRAWL_WORKERS = 16  # Pages fetched at the same time
+CRAWL_PER_HOST = 8  # Concurrent connections allowed to a single host
+PARSE_PROCESSES = min(os.cpu_count() or 1, 8)  # Worker processes parsing large crawled pages
+PARSE_POOL_MIN_BYTES = 256 * 1024  # Smaller pages are parsed by the thread that fetched them
+PARSE_POOL_MAX_BYTES = 32 * 1024 ** 2  # Larger pages are too, as they stream in, rather than held in memory
+
+# Pages are cached with their ETag/Last-Modified so repeat scrapes can be revalidated
+PAGE_CACHE_FILE = 'page_cache.json'
+PAGE_CACHE_MAX_ENTRIES = 2000
+PAGE_CACHE_VERSION = 2  # Bump when the extractor would find other URLs on the same page
+
+# Button images are resized once with PIL and then loaded by Tk directly
+IMAGE_CACHE_DIR = 'image_cache'
+BUTTON_IMAGE_SIZE = 48
+
+# Playback downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PREFETCH_AHEAD = 2  # Upcoming tracks downloaded in the background
+PREFETCH_BEHIND = 1  # Previous tracks kept on disk for a quick step back
+PLAYBACK_BUFFER_BYTES = 256 * 1024  # Bytes on disk before a track starts playing
+PROGRESS_INTERVAL_MS = 100  # How often the seeker and time label are refreshed
+SEARCH_DEBOUNCE_MS = 50  # Pause in typing before the track list is filtered
+WORKER_THREADS = 4  # Background jobs (scrapes, track loads) run at the same time
+WORKER_POLL_MS = 16  # How often background results are handed to the UI (~60 fps)
+
+# Downloaded tracks are kept across sessions, stored once per unique content
+AUDIO_CACHE_DIR = 'audio_cache'
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3
+AUDIO_CACHE_TOUCH_INTERVAL = 60  # Seconds between index saves for a file that keeps being used
+
+# Link checks before a playlist is built
+LINK_CACHE_FILE = 'link_cache.json'
+LINK_CHECK_TTL = 24 * 60 * 60  # Seconds a link check result is reused
+LINK_CHECK_WORKERS = 16
+# Types servers send for audio besides audio/*; application/ogg is common for .ogg files
+AUDIO_CONTENT_TYPES = ('application/octet-stream', 'binary/octet-stream', 'application/mp3', 'application/ogg')
+# Types that only force a download; accepted when the URL path names an audio file
+DOWNLOAD_CONTENT_TYPES = ('application/x-download', 'application/force-download', 'application/download')
+# M3U playlists are served under audio/* types, but they list tracks rather than play
+PLAYLIST_CONTENT_TYPES = ('audio/x-mpegurl', 'audio/mpegurl', 'application/x-mpegurl',
+                          'application/vnd.apple.mpegurl', 'audio/x-scpls')
+
+# All downloads share one connection pool and bandwidth budget, in priority order
+PRIORITY_PLAYING = 0  # The track the user is listening to or waiting for
+PRIORITY_PREFETCH = 1  # Tracks next to it in the playlist
+PRIORITY_BACKGROUND = 2  # Bulk saves and metadata probes
+DOWNLOAD_RATE_LIMIT = 0  # Bytes per second over all downloads; 0 for no limit
+HOST_RATE_LIMIT = 0  # Bytes per second from any one host; 0 for no limit
+DOWNLOAD_POOL_SIZE = 16  # Connections kept open per host
+
+# Bulk downloads ("mine the site")
+BULK_WORKERS = 8  # Files downloaded at the same time
+BULK_PER_HOST = 4  # Concurrent downloads allowed from a single host
+BULK_RETRIES = 5  # Retries per file after a transient error
+BULK_BACKOFF = 1.0  # Seconds before the first retry, doubled for each further one
+PART_VALIDATOR_SUFFIX = '.part.json'  # ETag and Last-Modified of the file a .part belongs to
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Metadata probing reads only the start and end of each MP3
+PROBE_HEAD_BYTES = 16 * 1024  # Enough for the ID3v2 tag and first frame of most files
+PROBE_FRAME_BYTES = 4096  # Read at the end of the ID3v2 tag when it is larger than the head
+PROBE_WORKERS = 8
+FINGERPRINT_BYTES = 4096  # Bytes hashed from each end of a file to recognise copies of it
+
+# Podcast feeds and playlists, recognised by Content-Type or, for generic types, extension
+FEED_CONTENT_TYPES = {
+    'application/rss+xml': 'rss', 'application/atom+xml': 'rss', 'application/xml': 'rss',
+    'text/xml': 'rss', 'application/x-rss+xml': 'rss',
+    'audio/x-mpegurl': 'm3u', 'audio/mpegurl': 'm3u', 'application/x-mpegurl': 'm3u',
+    'application/vnd.apple.mpegurl': 'm3u',
+    'audio/x-scpls': 'pls', 'audio/scpls': 'pls',
+}
+GENERIC_CONTENT_TYPES = ('text/plain', 'application/octet-stream', 'binary/octet-stream')
+FEED_EXTENSIONS = {'.m3u': 'm3u', '.m3u8': 'm3u', '.pls': 'pls', '.rss': 'rss', '.xml': 'rss'}
+
+# Library of visited sites, their tracks and play counts
+LIBRARY_FILE = 'library.db'
+LIBRARY_BUSY_TIMEOUT = 10  # Seconds to wait for another instance holding the write lock
+HISTORY_FILE = 'url_history.json'  # Imported into the library, then renamed
+HISTORY_SIZE = 10  # Sites shown under "Recent Websites"
+
+# Seek tables of downloaded tracks, kept next to each MP3
+SEEK_TABLE_SUFFIX = '.seek'
+SEEK_TABLE_MAGIC = b'MP3SEEK1'
+SEEK_TABLE_HEADER = '<8sQqIIc'  # Magic, MP3 size, MP3 mtime in ns, samples per frame, sample rate, typecode
+NON_MPEG_MAGIC = (b'OggS', b'fLaC', b'RIFF')  # Other audio formats the player can play
+
+# Links with these extensions never lead to another HTML page
+NON_PAGE_EXTENSIONS = (
+    '.mp3', '.m4a', '.ogg', '.oga', '.opus', '.wav', '.flac', '.zip', '.rar', '.pdf',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico',
+    '.css', '.js', '.json', '.xml', '.mp4', '.webm', '.avi',
+)
+
+class Span:
+    """One timed stage, recorded by the Tracer when the with-block ends"""
+    __slots__ = ('tracer', 'name', 'fields', 'start')
+    
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.start = None
+    
+    def __enter__(self):
+        self.tracer._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.tracer._stack().pop()
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        self.tracer._record(self, duration)
+        return False
+
+class NullSpan:
+    """Stands in for Span while tracing is off"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Tracer:
+    """
+    Records timing spans and counters for the slow stages of the app
+    
+    Off by default: span() then hands out a shared do-nothing context manager
+    and add()/annotate()/count() return at once, so instrumented code only
+    pays an attribute check. When on, every finished span is written as one
+    JSON line and/or summed up into a table printed at exit.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self.print_summary = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.durations = {}  # Span name -> list of durations in seconds
+        self.byte_totals = {}  # Span name -> bytes transferred
+        self.counters = {}
+        self.origin = time.perf_counter()
+    
+    def enable(self, path=None, summary=False):
+        """
+        Starts recording spans
+        
+        Args:
+            path (str): File the spans are appended to as JSON lines
+            summary (bool): Print a summary table to stderr at exit
+        """
+        if path:
+            self.output = open(path, 'a', buffering=1)
+        self.print_summary = summary
+        self.enabled = True
+        atexit.register(self.close)
+    
+    def span(self, name, **fields):
+        """Returns a context manager timing the stage called name"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, fields)
+    
+    def annotate(self, **fields):
+        """Sets fields on the innermost open span of this thread"""
+        if self.enabled:
+            stack = self._stack()
+            if stack:
+                stack[-1].fields.update(fields)
+    
+    def add(self, field, amount=1):
+        """Adds to a numeric field of the innermost open span of this thread"""
+        if self.enabled:
+            stack = self._stack()
+            if stack:
+                fields = stack[-1].fields
+                fields[field] = fields.get(field, 0) + amount
+    
+    def count(self, name, amount=1):
+        """Adds to a counter that isn't tied to any span"""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def measure_chunks(self, chunks):
+        """
+        Passes byte chunks through, adding their size and the time spent
+        waiting for them to the current span as 'bytes' and 'wait'
+        """
+        if not self.enabled:
+            return chunks
+        return self._measure_chunks(chunks)
+    
+    def _measure_chunks(self, chunks):
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add('wait', time.perf_counter() - started)
+            self.add('bytes', len(chunk))
+            yield chunk
+    
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+    
+    def _record(self, span, duration):
+        with self.lock:
+            self.durations.setdefault(span.name, []).append(duration)
+            if 'bytes' in span.fields:
+                self.byte_totals[span.name] = self.byte_totals.get(span.name, 0) + span.fields['bytes']
+            if self.output:
+                record = {'name': span.name, 'start': round(span.start - self.origin, 6),
+                          'duration': round(duration, 6), 'thread': threading.current_thread().name}
+                record.update((key, round(value, 6) if isinstance(value, float) else value)
+                              for key, value in span.fields.items())
+                self.output.write(json.dumps(record, default=str) + '\n')
+    
+    def summary(self):
+        """
+        Builds a table of span timings and counters
+        
+        Returns:
+            str: One row per span name, slowest total first
+        """
+        with self.lock:
+            rows = [f"{'span':<18} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'MB':>8}"]
+            for name, durations in sorted(self.durations.items(), key=lambda item: -sum(item[1])):
+                ordered = sorted(durations)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                megabytes = self.byte_totals.get(name, 0) / 2**20
+                rows.append(f"{name:<18} {len(durations):>7} {sum(durations):>9.3f} "
+                            f"{sum(durations) / len(durations) * 1000:>9.2f} {p95 * 1000:>9.2f} "
+                            f"{ordered[-1] * 1000:>9.2f} {megabytes:>8.2f}")
+            for name, value in sorted(self.counters.items()):
+                rows.append(f"{name:<18} {value:>7}")
+        return '\n'.join(rows)
+    
+    def close(self):
+        """Writes the counters and summary, and closes the output file"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        with self.lock:
+            if self.output:
+                for name, value in sorted(self.counters.items()):
+                    self.output.write(json.dumps({'counter': name, 'value': value}) + '\n')
+                self.output.close()
+                self.output = None
+        if self.print_summary:
+            print(self.summary(), file=sys.stderr)
+
+tracer = Tracer()
+
+def traced(name):
+    """Decorator recording every call of a function as a span called name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
 
 def load_app_icon(root):
     """Load the icon for the given root window"""
+    import tkinter as tk
     try:
         if os.path.exists('icon.png'):
-            return ImageTk.PhotoImage(Image.open('icon.png'))
+            return tk.PhotoImage(master=root, file='icon.png')  # Tk reads PNG itself
     except Exception as e:
         print(f"Error loading icon: {e}")
     return None
 
-def load_url_history():
-    """Load URL history from JSON file"""
+def cached_button_image(filename, size=BUTTON_IMAGE_SIZE):
+    """
+    Returns the path of a copy of an image resized to size x size pixels
+    
+    The copy is made with PIL the first time, and again whenever the original
+    changes; later starts load it with tk.PhotoImage without importing PIL.
+    
+    Args:
+        filename (str): The original PNG
+        size (int): Width and height of the button image
+        
+    Returns:
+        str: Path of the resized PNG in IMAGE_CACHE_DIR
+    """
+    cached = os.path.join(IMAGE_CACHE_DIR, f"{size}_{os.path.basename(filename)}")
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(filename):
+        return cached
+    from PIL import Image
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    img = Image.open(filename).convert('RGBA')  # Force RGBA for transparency
+    img = img.resize((size, size), Image.Resampling.LANCZOS)
+    fd, tmp_path = tempfile.mkstemp(suffix='.png', dir=IMAGE_CACHE_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        img.save(f, 'PNG')
+    os.replace(tmp_path, cached)  # Another instance may be writing the same file
+    return cached
+
+class LazyMixer:
+    """
+    pygame.mixer, imported and initialised the first time it is used
+    
+    Importing pygame and opening the audio device take longer than building
+    the player window, so both wait until the user starts a track.
+    """
+    def __init__(self):
+        self.module = None
+    
+    @property
+    def music(self):
+        return self.init().music
+    
+    def init(self):
+        if self.module is None:
+            with tracer.span('mixer_init'):
+                os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+                from pygame import mixer
+                mixer.init()
+            self.module = mixer
+        return self.module
+    
+    def quit(self):
+        if self.module is not None:
+            self.module.quit()
+
+class Library:
+    """
+    SQLite store of visited sites, their track lists, track metadata and play counts
+    
+    Each thread gets its own connection. The database runs in WAL mode with a
+    busy timeout, so several instances of the app can read and write it at
+    the same time.
+    """
+    
+    TRACK_FIELDS = ('title', 'artist', 'duration', 'bitrate', 'size', 'fingerprint')
+    
+    def __init__(self, path=LIBRARY_FILE):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS sites (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    last_visited TEXT NOT NULL,
+                    visits INTEGER NOT NULL DEFAULT 1
+                );
+                CREATE INDEX IF NOT EXISTS sites_by_visit ON sites (last_visited);
+                CREATE TABLE IF NOT EXISTS site_tracks (
+                    site_id INTEGER NOT NULL REFERENCES sites (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    PRIMARY KEY (site_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS tracks (
+                    url TEXT PRIMARY KEY,
+                    title TEXT,
+                    artist TEXT,
+                    duration REAL,
+                    bitrate INTEGER,
+                    size INTEGER,
+                    plays INTEGER NOT NULL DEFAULT 0,
+                    last_played TEXT,
+                    fingerprint TEXT
+                );
+            """)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(tracks)")}
+            if 'fingerprint' not in columns:
+                # Libraries made before fingerprints were stored
+                try:
+                    db.execute("ALTER TABLE tracks ADD COLUMN fingerprint TEXT")
+                except sqlite3.OperationalError as e:
+                    if 'duplicate column' not in str(e):  # Another instance just added it
+                        raise
+        self._migrate_history()
+    
+    def connect(self):
+        """Returns this thread's connection, opening it on first use"""
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=LIBRARY_BUSY_TIMEOUT)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self.local.db = db
+        return db
+    
+    def _migrate_history(self):
+        # Import the url_history.json kept by earlier versions, once
+        if not os.path.exists(HISTORY_FILE):
+            return
+        try:
+            with open(HISTORY_FILE, 'r') as f:
+                history = json.load(f)
+            with self.connect() as db:
+                db.executemany("""
+                    INSERT INTO sites (url, last_visited) VALUES (?, ?)
+                    ON CONFLICT (url) DO NOTHING
+                """, [(h['url'], h['timestamp']) for h in history])
+            os.replace(HISTORY_FILE, HISTORY_FILE + '.migrated')
+        except (OSError, ValueError, KeyError, TypeError, sqlite3.Error) as e:
+            print(f"Error migrating {HISTORY_FILE}: {e}")
+    
+    def recent_sites(self, limit=HISTORY_SIZE):
+        """
+        Returns the most recently visited sites
+        
+        Returns:
+            list: Dicts with 'url' and 'timestamp', newest first
+        """
+        rows = self.connect().execute(
+            "SELECT url, last_visited FROM sites ORDER BY last_visited DESC LIMIT ?", (limit,))
+        return [{'url': url, 'timestamp': timestamp} for url, timestamp in rows]
+    
+    def add_site(self, url, mp3_urls=None):
+        """
+        Records a visit to a site, and the tracks found on it when given
+        
+        Args:
+            url (str): The URL that was scraped
+            mp3_urls (list): Tracks found, replacing the stored list for the site
+        """
+        with self.connect() as db:
+            db.execute("""
+                INSERT INTO sites (url, last_visited) VALUES (?, ?)
+                ON CONFLICT (url) DO UPDATE SET last_visited = excluded.last_visited, visits = visits + 1
+            """, (url, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            site_id = db.execute("SELECT id FROM sites WHERE url = ?", (url,)).fetchone()[0]
+            if mp3_urls is not None:
+                db.execute("DELETE FROM site_tracks WHERE site_id = ?", (site_id,))
+                db.executemany("INSERT INTO site_tracks (site_id, position, url) VALUES (?, ?, ?)",
+                               ((site_id, i, mp3_url) for i, mp3_url in enumerate(mp3_urls)))
+    
+    def site_tracks(self, url):
+        """Returns the tracks stored for a site, in page order, or an empty list"""
+        rows = self.connect().execute("""
+            SELECT site_tracks.url FROM site_tracks JOIN sites ON sites.id = site_tracks.site_id
+            WHERE sites.url = ? ORDER BY position
+        """, (url,))
+        return [mp3_url for mp3_url, in rows]
+    
+    def track_info(self, mp3_urls):
+        """
+        Looks up the stored metadata of many tracks
+        
+        Returns:
+            dict: URL -> dict of the known fields, for the tracks that have any
+        """
+        db = self.connect()
+        columns = ', '.join(self.TRACK_FIELDS)
+        info = {}
+        mp3_urls = list(mp3_urls)
+        # Stay below SQLite's limit on query parameters
+        for start in range(0, len(mp3_urls), 500):
+            batch = mp3_urls[start:start + 500]
+            rows = db.execute(f"SELECT url, {columns} FROM tracks WHERE url IN ({', '.join('?' * len(batch))})",
+                              batch)
+            for url, *values in rows:
+                known = {field: value for field, value in zip(self.TRACK_FIELDS, values) if value is not None}
+                if known:
+                    info[url] = known
+        return info
+    
+    def save_track_info(self, track_info):
+        """
+        Stores track metadata, keeping stored fields that the new info lacks
+        
+        Args:
+            track_info (dict): URL -> dict with any of TRACK_FIELDS
+        """
+        columns = ', '.join(self.TRACK_FIELDS)
+        updates = ', '.join(f"{field} = COALESCE(excluded.{field}, {field})" for field in self.TRACK_FIELDS)
+        with self.connect() as db:
+            db.executemany(f"""
+                INSERT INTO tracks (url, {columns}) VALUES (?, {', '.join('?' * len(self.TRACK_FIELDS))})
+                ON CONFLICT (url) DO UPDATE SET {updates}
+            """, ((url, *(info.get(field) for field in self.TRACK_FIELDS))
+                  for url, info in track_info.items()))
+    
+    def record_play(self, url):
+        """Counts one play of a track"""
+        with self.connect() as db:
+            db.execute("""
+                INSERT INTO tracks (url, plays, last_played) VALUES (?, 1, ?)
+                ON CONFLICT (url) DO UPDATE SET plays = plays + 1, last_played = excluded.last_played
+            """, (url, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+def write_json_atomic(path, data):
+    """Write data as JSON so readers see either the old file or the new one, never a torn write"""
+    # A unique name, as another instance may be saving the same file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def load_page_cache():
+    """Load the page revalidation cache from JSON file"""
+    try:
+        if os.path.exists(PAGE_CACHE_FILE):
+            with open(PAGE_CACHE_FILE, 'r') as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading page cache: {e}")
+    return {}
+
+def save_page_cache(cache):
+    """Save the page revalidation cache to JSON file, dropping the least recently checked pages"""
+    if len(cache) > PAGE_CACHE_MAX_ENTRIES:
+        newest = sorted(cache.items(), key=lambda item: item[1].get('checked', ''), reverse=True)
+        cache = dict(newest[:PAGE_CACHE_MAX_ENTRIES])
+    try:
+        write_json_atomic(PAGE_CACHE_FILE, cache)
+    except (OSError, ValueError) as e:
+        print(f"Error saving page cache: {e}")
+
+def create_session(pool_size=CRAWL_PER_HOST):
+    """
+    Creates a requests session that keeps connections alive between requests
+    
+    Args:
+        pool_size (int): Number of connections kept open per host
+        
+    Returns:
+        requests.Session: Session with a connection pool of the given size
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` bytes per second, with bursts of up to a second's worth
+    
+    A transfer may overdraw the bucket by one chunk; it then sleeps until the
+    debt is paid off, which keeps the average rate exact.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def take(self, num_bytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= num_bytes
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+class Transfer:
+    """A download registered with the DownloadScheduler"""
+    __slots__ = ('host', 'priority', 'cancel_event')
+    
+    def __init__(self, host, priority, cancel_event):
+        self.host = host
+        self.priority = priority
+        self.cancel_event = cancel_event
+
+class DownloadScheduler:
+    """
+    Shares one connection pool and the available bandwidth between all downloads
+    
+    Every download runs as a Transfer in one of three priority classes:
+    the track being played, prefetched tracks, and background work (bulk
+    saves and metadata probes). A transfer only reads its next chunk while
+    no transfer of a more urgent class is running; the paused connections
+    then stop receiving (TCP flow control), which leaves the bandwidth to the
+    track the user is waiting for. Global and per-host token buckets cap the
+    overall rate.
+    """
+    def __init__(self, rate_limit=DOWNLOAD_RATE_LIMIT, host_rate_limit=HOST_RATE_LIMIT,
+                 pool_size=DOWNLOAD_POOL_SIZE):
+        self.pool_size = pool_size
+        self._session = None
+        self.limiter = RateLimiter(rate_limit)
+        self.host_rate_limit = host_rate_limit
+        self.host_limiters = {}
+        self.transfers = set()
+        self.condition = threading.Condition()
+    
+    @property
+    def session(self):
+        """The shared requests session, created on first use"""
+        with self.condition:
+            if self._session is None:
+                self._session = create_session(self.pool_size)
+            return self._session
+    
+    def set_rate_limits(self, rate_limit=None, host_rate_limit=None):
+        """Changes the global and/or per-host limit in bytes per second (0: unlimited)"""
+        with self.condition:
+            if rate_limit is not None:
+                self.limiter = RateLimiter(rate_limit)
+            if host_rate_limit is not None:
+                self.host_rate_limit = host_rate_limit
+                self.host_limiters = {}
+    
+    @contextlib.contextmanager
+    def transfer(self, url, priority, cancel_event=None):
+        """
+        Registers a download for the duration of a with-block
+        
+        Args:
+            url (str): What is being downloaded; its host gets its own rate limit
+            priority (int): PRIORITY_PLAYING, PRIORITY_PREFETCH or PRIORITY_BACKGROUND
+            cancel_event (threading.Event): Stops throttle() from waiting once set
+            
+        Yields:
+            Transfer: Handle to pass to throttle() and set_priority()
+        """
+        transfer = Transfer(urlparse(url).netloc.lower(), priority, cancel_event)
+        with self.condition:
+            self.transfers.add(transfer)
+        try:
+            yield transfer
+        finally:
+            with self.condition:
+                self.transfers.discard(transfer)
+                self.condition.notify_all()
+    
+    def set_priority(self, transfer, priority):
+        """Moves a running transfer to another class, e.g. when its track starts playing"""
+        with self.condition:
+            transfer.priority = priority
+            self.condition.notify_all()
+    
+    def throttle(self, transfer, num_bytes):
+        """
+        Waits until a transfer may go on to receive num_bytes more
+        
+        Blocks while a more urgent transfer is running, then charges the
+        bytes to the global and per-host rate limits.
+        """
+        with self.condition:
+            while any(other.priority < transfer.priority for other in self.transfers):
+                if transfer.cancel_event is not None and transfer.cancel_event.is_set():
+                    return
+                tracer.count('throttled_waits')
+                # Wake up now and then to notice cancellation
+                self.condition.wait(0.25)
+            limiter = self.limiter
+            host_limiter = None
+            if self.host_rate_limit:
+                host_limiter = self.host_limiters.get(transfer.host)
+                if host_limiter is None:
+                    host_limiter = self.host_limiters[transfer.host] = RateLimiter(self.host_rate_limit)
+        limiter.take(num_bytes)
+        if host_limiter:
+            host_limiter.take(num_bytes)
+
+scheduler = DownloadScheduler()
+
+# Streaming extraction settings
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read from the network at a time
+SCRIPT_BUFFER_LIMIT = 256 * 1024  # Script text held before it is scanned early
+SCRIPT_OVERLAP = 4096  # Script text kept after an early scan so URLs aren't split
+
+# Audio formats the player can play; links to them are collected as tracks
+AUDIO_EXTENSIONS = ('mp3', 'ogg', 'oga', 'opus', 'flac', 'wav')
+_AUDIO_EXTENSION = r'\.(?:' + '|'.join(AUDIO_EXTENSIONS) + ')'
+# An audio file name ending the path (before any ?query or #fragment) or the whole URL
+AUDIO_URL_PATTERN = re.compile(_AUDIO_EXTENSION + r'(?=[?#]|$)', re.I)
+AUDIO_NAME_SUFFIX = re.compile(_AUDIO_EXTENSION + '$', re.I | re.M)
+# Types of MPEG audio, which plays from the .mp3 a track is saved as when its URL has no extension
+MPEG_AUDIO_TYPES = ('audio/mpeg', 'audio/mp3', 'audio/mpeg3', 'audio/x-mpeg', 'audio/x-mp3')
+# Audio URLs in script text and JSON: any quoted string, relative ones included,
+# and absolute URLs outside quotes. Both may carry a query string.
+SCRIPT_AUDIO_PATTERN = re.compile(r"""
+    ["'`] (?P<quoted> [^"'`\s<>]+? """ + _AUDIO_EXTENSION + r""" (?:[?\#][^"'`\s<>]*)? ) ["'`]
+  | (?P<bare> https?:(?:\\?/){2} [^"'`\s<>]+? """ + _AUDIO_EXTENSION + r""" (?:[?\#][^"'`\s<>]*)? )
+    (?![\w/.%-])
+""", re.I | re.X)
+SCRIPT_ESCAPE_PATTERN = re.compile(r'\\(?:/|u([0-9a-fA-F]{4}))')  # \/ and \uXXXX in JSON and JS strings
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.I)
+
+def audio_extension(url):
+    """
+    The extension a track is saved under, e.g. '.ogg'
+    
+    SDL_mixer chooses its decoder by the file extension, so a local copy must
+    keep the one of its URL.
+    """
+    match = AUDIO_URL_PATTERN.search(url)
+    return match.group(0).lower() if match else '.mp3'
+
+# URL canonicalization
+PERCENT_ESCAPE_PATTERN = re.compile(r'%([0-9A-Fa-f]{2})?')
+UNRESERVED_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+PATH_SAFE_CHARS = "/:@!$&'()*+,;=~%"  # Left as they are; everything else is percent-encoded
+QUERY_SAFE_CHARS = PATH_SAFE_CHARS + '?'
+DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+# Most URLs on a page are canonical already: lowercase host, no port,
+# fragment, escape or character that needs one
+CANONICAL_URL_PATTERN = re.compile(r"https?://[a-z0-9.-]+/[\w\-.~/:@!$&'()*+,;=]*(?:\?[\w\-.~/?:@!$&'()*+,;=]+)?",
+                                   re.A)
+
+def _normalize_escape(match):
+    code = match.group(1)
+    if code is None:
+        return '%25'  # A lone % stands for itself
+    char = chr(int(code, 16))
+    return char if char in UNRESERVED_CHARS else '%' + code.upper()
+
+def canonical_url(url):
+    """
+    Rewrites a URL so that different spellings of the same address compare equal
+    
+    Lowercases the scheme and host, drops the default port and the fragment,
+    and spells every percent-escape the same way: spaces and non-ASCII
+    characters are encoded, letters and digits are not, and hex digits are
+    uppercase. The query string is kept (signed links need it), so the result
+    can still be fetched.
+    
+    Args:
+        url (str): An absolute URL
+        
+    Returns:
+        str: The canonical form, e.g. HTTP://Example.com:80/a%7eb/My Song.mp3#t=5
+        -> http://example.com/a~b/My%20Song.mp3
+    """
+    if CANONICAL_URL_PATTERN.fullmatch(url):
+        return url
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    scheme = scheme.lower()
+    if netloc:
+        userinfo, at, host = netloc.rpartition('@')
+        host = host.lower()
+        port = DEFAULT_PORTS.get(scheme)
+        if port and host.endswith(port):
+            host = host[:-len(port)]
+        netloc = userinfo + at + host
+        path = path or '/'
+    if '%' in path:
+        path = PERCENT_ESCAPE_PATTERN.sub(_normalize_escape, path)
+    if '%' in query:
+        query = PERCENT_ESCAPE_PATTERN.sub(_normalize_escape, query)
+    return urlunsplit((scheme, netloc, quote(path, safe=PATH_SAFE_CHARS),
+                       quote(query, safe=QUERY_SAFE_CHARS), ''))
+
+def _unescape_script_char(match):
+    return chr(int(match.group(1), 16)) if match.group(1) else '/'
+
+class Mp3LinkExtractor(HTMLParser):
+    """
+    Event-driven HTML parser that collects MP3 candidates in a single pass
+    
+    Finds audio URLs in <a href>, <source src>, data-song attributes, JSON
+    attribute values and inline scripts while the page is fed in, without
+    building a document tree. Script bodies are scanned in bounded pieces, so
+    memory use does not grow with the size of the page. URLs are
+    canonicalized, so each address is collected once, in page order.
+    """
+    def __init__(self, url, collect_links=False):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.collect_links = collect_links
+        self.mp3_urls = {}  # Insertion-ordered set
+        self.links = {}
+        self._script_parts = []
+        self._script_size = 0
+    
+    def _add_candidate(self, value, is_link=False):
+        value = value.strip()
+        full_url = value if value.startswith(('http://', 'https://')) else urljoin(self.url, value)
+        if AUDIO_URL_PATTERN.search(full_url):
+            self.mp3_urls.setdefault(canonical_url(full_url), None)
+        elif is_link and self.collect_links:
+            self.links.setdefault(canonical_url(full_url), None)
+    
+    def _scan_text(self, text, final=True):
+        for match in SCRIPT_AUDIO_PATTERN.finditer(text):
+            if not final and match.end() == len(text):
+                continue  # May be cut short; the next scan sees all of it
+            candidate = match.group('quoted') or match.group('bare')
+            if '\\' in candidate:
+                candidate = SCRIPT_ESCAPE_PATTERN.sub(_unescape_script_char, candidate)
+            self._add_candidate(candidate)
+    
+    def handle_starttag(self, tag, attrs):
+        if not attrs:
+            return
+        attrs = dict(attrs)
+        if tag == 'a' and attrs.get('href') is not None:
+            self._add_candidate(attrs['href'], is_link=True)
+        elif tag == 'source' and attrs.get('src'):
+            self._add_candidate(attrs['src'])
+        if attrs.get('data-song') is not None:
+            self._add_candidate(attrs['data-song'])
+        for value in attrs.values():
+            # Players often keep their playlist as JSON in a data-* attribute
+            if value and value[0] in '{[':
+                self._scan_text(value)
+    
+    def handle_data(self, data):
+        if self.cdata_elem == 'script':
+            self._script_parts.append(data)
+            self._script_size += len(data)
+            if self._script_size > SCRIPT_BUFFER_LIMIT:
+                self._scan_script(final=False)
+    
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self._scan_script(final=True)
+    
+    def _scan_script(self, final):
+        text = ''.join(self._script_parts)
+        self._scan_text(text, final)
+        # Keep a tail so a URL split across two scans is still found
+        tail = '' if final else text[-SCRIPT_OVERLAP:]
+        self._script_parts = [tail] if tail else []
+        self._script_size = len(tail)
+    
+    def close(self):
+        super().close()
+        # A <script> left open at the end of the page is still scanned
+        if self._script_parts:
+            self._scan_script(final=True)
+    
+    def feed(self, data):
+        super().feed(data)
+        # HTMLParser holds a <script> or <style> body until its closing tag
+        # arrives; hand most of it over early so the buffer stays bounded
+        if self.cdata_elem and len(self.rawdata) > SCRIPT_BUFFER_LIMIT:
+            cut = len(self.rawdata) - SCRIPT_OVERLAP
+            self.handle_data(self.rawdata[:cut])
+            self.rawdata = self.rawdata[cut:]
+
+def detect_encoding(content_type, first_chunk):
+    """
+    Picks the charset for a page without sniffing the whole body
+    
+    Args:
+        content_type (str): Value of the Content-Type header
+        first_chunk (bytes): Start of the body, searched for a <meta charset>
+        
+    Returns:
+        str: Name of the encoding to decode the page with
+    """
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            return value.strip().strip('"\'')
+    match = META_CHARSET_PATTERN.search(first_chunk[:4096])
+    if match:
+        return match.group(1).decode('ascii')
+    return 'utf-8'
+
+def parse_stream(chunks, url, content_type='', collect_links=False):
+    """
+    Extracts MP3 URLs from an HTML page as its bytes arrive
+    
+    Args:
+        chunks (iterable): Byte chunks of the page, e.g. response.iter_content()
+        url (str): The URL the page was fetched from, used to resolve relative links
+        content_type (str): Value of the Content-Type header, used for the charset
+        collect_links (bool): Also collect non-MP3 <a href> links for crawling
+        
+    Returns:
+        tuple: (list of MP3 URLs, list of absolute link URLs) in page order
+    """
+    extractor = Mp3LinkExtractor(url, collect_links=collect_links)
+    decoder = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if decoder is None:
+            encoding = detect_encoding(content_type, chunk)
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        extractor.feed(decoder.decode(chunk))
+    if decoder is not None:
+        extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+    return list(extractor.mp3_urls), list(extractor.links)
+
+def parse_page(html, url):
+    """
+    Extracts MP3 URLs and outgoing links from an HTML page
+    
+    Args:
+        html (str): The HTML content of the page
+        url (str): The URL the page was fetched from, used to resolve relative links
+        
+    Returns:
+        tuple: (list of MP3 URLs, list of absolute link URLs) in page order
+    """
+    extractor = Mp3LinkExtractor(url, collect_links=True)
+    extractor.feed(html)
+    extractor.close()
+    return list(extractor.mp3_urls), list(extractor.links)
+
+def feed_kind(content_type, url):
+    """
+    Tells whether a response is a podcast feed or playlist rather than an HTML page
+    
+    Args:
+        content_type (str): Value of the Content-Type header
+        url (str): The URL of the response, checked when the type is generic
+        
+    Returns:
+        str: 'rss', 'm3u' or 'pls', or None for anything else
+    """
+    mime = content_type.split(';')[0].strip().lower()
+    if mime in FEED_CONTENT_TYPES:
+        return FEED_CONTENT_TYPES[mime]
+    if not mime or mime in GENERIC_CONTENT_TYPES:
+        path = urlparse(url).path.lower()
+        for extension, kind in FEED_EXTENSIONS.items():
+            if path.endswith(extension):
+                return kind
+    return None
+
+def parse_duration(value):
+    """Converts '1:02:03', '62:03' or '3723' to seconds, or None if there is no usable duration"""
+    try:
+        seconds = 0
+        for part in value.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds if seconds > 0 else None
+    except (ValueError, AttributeError):
+        return None
+
+def decode_lines(chunks, content_type):
+    """Yields the lines of a text body as its byte chunks arrive"""
+    decoder = None
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if decoder is None:
+            if chunk.startswith(codecs.BOM_UTF8):
+                encoding = 'utf-8-sig'
+            else:
+                encoding = detect_encoding(content_type, b'')
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        lines = (pending + decoder.decode(chunk)).splitlines()
+        # The last line may continue in the next chunk
+        pending = lines.pop() if lines else ''
+        yield from lines
+    if decoder is not None:
+        yield from (pending + decoder.decode(b'', final=True)).splitlines()
+
+def parse_m3u(lines, url):
+    """
+    Reads the tracks of an M3U/M3U8 playlist
+    
+    Yields:
+        tuple: (URL, info dict) with the title and duration of its #EXTINF line
+    """
+    info = {}
+    for line in lines:
+        line = line.strip()
+        if line.upper().startswith('#EXTINF:'):
+            duration, _, title = line[8:].partition(',')
+            info = {}
+            duration = parse_duration(duration.split()[0] if duration.split() else '')
+            if duration:
+                info['duration'] = duration
+            if title.strip():
+                info['title'] = title.strip()
+        elif line and not line.startswith('#'):
+            yield urljoin(url, line), info
+            info = {}
+
+def parse_pls(lines, url):
+    """
+    Reads the tracks of a PLS playlist
+    
+    PLS keeps FileN, TitleN and LengthN as separate keys, so the entries are
+    only known once the whole (small) file has been read.
+    
+    Yields:
+        tuple: (URL, info dict) in playlist order
+    """
+    entries = {}
+    for line in lines:
+        key, _, value = line.strip().partition('=')
+        match = re.fullmatch(r'(file|title|length)(\d+)', key.strip().lower())
+        if match and value.strip():
+            entries.setdefault(int(match.group(2)), {})[match.group(1)] = value.strip()
+    for number in sorted(entries):
+        entry = entries[number]
+        if 'file' not in entry:
+            continue
+        info = {}
+        if entry.get('title'):
+            info['title'] = entry['title']
+        duration = parse_duration(entry.get('length', ''))
+        if duration:
+            info['duration'] = duration
+        yield urljoin(url, entry['file']), info
+
+def parse_rss(chunks, url):
+    """
+    Reads the audio enclosures of an RSS or Atom feed as its bytes arrive
+    
+    Each <item>/<entry> is dropped from the tree as soon as it has been read,
+    so memory use doesn't grow with the size of the feed.
+    
+    Yields:
+        tuple: (URL, info dict) with the episode title, duration and size
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    parents = []
+    
+    def read_item(item):
+        audio_url = None
+        info = {}
+        for child in item:
+            tag = child.tag.rpartition('}')[2]
+            if tag == 'title' and child.text and child.text.strip():
+                info['title'] = child.text.strip()
+            elif tag == 'duration':
+                duration = parse_duration(child.text or '')
+                if duration:
+                    info['duration'] = duration
+            elif audio_url is None and (tag == 'enclosure' or (tag == 'link' and child.get('rel') == 'enclosure')
+                                        or tag == 'content'):
+                href = (child.get('url') or child.get('href') or '').strip()
+                media_type = (child.get('type') or '').split(';')[0].strip().lower()
+                # Skip formats the mixer can't play, such as AAC/M4A podcasts
+                playable = AUDIO_URL_PATTERN.search(urlparse(href).path) or media_type in MPEG_AUDIO_TYPES
+                if href and playable:
+                    audio_url = urljoin(url, href)
+                    size = child.get('length') or child.get('fileSize') or ''
+                    if size.isdigit() and int(size) > 0:
+                        info['size'] = int(size)
+        return audio_url, info
+    
+    def read_events():
+        for event, element in parser.read_events():
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            if element.tag.rpartition('}')[2] in ('item', 'entry'):
+                audio_url, info = read_item(element)
+                if parents:
+                    parents[-1].remove(element)
+                if audio_url:
+                    yield audio_url, info
+    
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+            yield from read_events()
+    parser.close()
+    yield from read_events()
+
+def parse_feed(kind, chunks, url, content_type=''):
+    """
+    Extracts the tracks of a podcast feed or playlist as its bytes arrive
+    
+    Args:
+        kind (str): 'rss', 'm3u' or 'pls', as returned by feed_kind()
+        chunks (iterable): Byte chunks of the body, e.g. response.iter_content()
+        url (str): The URL the feed was fetched from, used to resolve relative links
+        content_type (str): Value of the Content-Type header, used for the charset
+        
+    Returns:
+        tuple: (list of track URLs in feed order, dict of URL -> title/duration/size)
+    """
+    if kind == 'rss':
+        tracks = parse_rss(chunks, url)
+    elif kind == 'pls':
+        tracks = parse_pls(decode_lines(chunks, content_type), url)
+    else:
+        tracks = parse_m3u(decode_lines(chunks, content_type), url)
+    
+    mp3_urls = {}  # Insertion-ordered set
+    track_info = {}
+    for track_url, info in tracks:
+        if urlparse(track_url).scheme not in ('http', 'https'):
+            continue  # Local file paths in a playlist can't be fetched
+        track_url = canonical_url(track_url)
+        mp3_urls.setdefault(track_url, None)
+        if info:
+            track_info.setdefault(track_url, info)
+    return list(mp3_urls), track_info
+
+def parse_body(body, url, content_type='', collect_links=False):
+    """
+    Extracts MP3 URLs and links from a page that has been read into memory
+    
+    Runs in ParsePool's worker processes, so it takes only picklable
+    arguments. The body is fed to the parser in memoryview slices, which
+    don't copy it.
+    """
+    view = memoryview(body)
+    chunks = (view[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(view), STREAM_CHUNK_SIZE))
+    return parse_stream(chunks, url, content_type, collect_links=collect_links)
+
+class ParsePool:
+    """
+    Parses large pages in worker processes, so a crawl isn't held to one core by the GIL
+    
+    Pages smaller than min_bytes are parsed in the calling thread, where
+    sending them to another process would cost more than it saves, and so
+    are pages over max_bytes, which would have to be held in memory whole.
+    The processes are started (with 'spawn', as the crawl already runs
+    threads) when the first large page arrives.
+    """
+    def __init__(self, processes=PARSE_PROCESSES, min_bytes=PARSE_POOL_MIN_BYTES,
+                 max_bytes=PARSE_POOL_MAX_BYTES):
+        self.processes = processes
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.executor = None
+        self.lock = threading.Lock()
+    
+    def parse(self, body, url, content_type='', collect_links=False):
+        """
+        Parses a page body, in a worker process if it is large
+        
+        Returns:
+            tuple: (list of MP3 URLs, list of absolute link URLs) in page order
+        """
+        if len(body) < self.min_bytes or self.processes < 2:
+            return parse_body(body, url, content_type, collect_links)
+        with self.lock:
+            if self.executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+        with tracer.span('parse_in_process', bytes=len(body)):
+            return self.executor.submit(parse_body, body, url, content_type, collect_links).result()
+    
+    def parse_chunks(self, chunks, url, content_type='', collect_links=False, length=None):
+        """
+        Parses a page as its chunks arrive, unless it is large enough for a worker process
+        
+        Only pages between min_bytes and max_bytes are read whole. A
+        Content-Length (length) settles that before anything is read;
+        otherwise up to max_bytes are buffered to find out.
+        
+        Returns:
+            tuple: (list of MP3 URLs, list of absolute link URLs) in page order
+        """
+        chunks = iter(chunks)
+        if self.processes < 2 or (length is not None and not self.min_bytes <= length <= self.max_bytes):
+            return parse_stream(chunks, url, content_type, collect_links=collect_links)
+        head = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size > self.max_bytes:
+                break
+        else:
+            if size >= self.min_bytes:
+                return self.parse(b''.join(head), url, content_type, collect_links)
+        # Small, or too large to hold: parse what was read and the rest as it streams in
+        return parse_stream(itertools.chain(head, chunks), url, content_type, collect_links=collect_links)
+    
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+@traced('fetch_page')
+def fetch_page(url, cache=None, session=None, collect_links=False, track_info=None, parse_pool=None):
+    """
+    Fetches a page and extracts its MP3 URLs, revalidating against the page cache
+    
+    When the cache holds an entry for the URL, the request carries its ETag and
+    Last-Modified values. A 304 Not Modified answer returns the cached result
+    without downloading or parsing the page again, and so does a failure to
+    reach the server at all. Entries made by an older extractor
+    (PAGE_CACHE_VERSION) are ignored.
+    
+    Podcast feeds and M3U/PLS playlists are detected by their Content-Type and
+    read with parse_feed() instead of the HTML extractor.
+    
+    Args:
+        url (str): The URL of the page to fetch
+        cache (dict): Page cache from load_page_cache(), updated in place
+        session (requests.Session): Session to send the request with
+        collect_links (bool): Also return the non-MP3 links on the page
+        track_info (dict): Updated in place with the titles and durations a
+            feed or playlist gives for its tracks
+        parse_pool (ParsePool): Parse large HTML pages in this pool's worker
+            processes; the rest are still parsed as they stream in
+        
+    Returns:
+        tuple: (list of MP3 URLs, list of absolute link URLs) in page order
+        
+    Raises:
+        requests.RequestException: If the page cannot be fetched
+    """
+    get = session.get if session else requests.get
+    entry = cache.get(url) if cache is not None else None
+    if entry and collect_links and 'links' not in entry:
+        entry = None  # Cached by a plain scrape, which didn't keep the links
+    if entry and entry.get('version') != PAGE_CACHE_VERSION:
+        entry = None  # Its URLs were found by an older extractor
+    
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    
+    try:
+        response = get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if not entry:
+            raise
+        tracer.annotate(url=url, offline=True)
+        # Offline: the last known result still lets cached tracks play
+        print(f"Could not reach {url}, using the cached page: {e}")
+        if track_info is not None:
+            track_info.update(entry.get('track_info', {}))
+        return entry['mp3_urls'], entry.get('links', [])
+    
+    feed_info = None
+    with response:
+        tracer.annotate(url=url, status=response.status_code)
+        if response.status_code == 304 and entry:
+            tracer.count('page_not_modified')
+            entry['checked'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if track_info is not None:
+                track_info.update(entry.get('track_info', {}))
+            return entry['mp3_urls'], entry.get('links', [])
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'text/html')
+        kind = feed_kind(content_type, response.url)
+        if kind:
+            chunks = tracer.measure_chunks(response.iter_content(STREAM_CHUNK_SIZE))
+            mp3_urls, feed_info = parse_feed(kind, chunks, response.url, content_type)
+            links = []
+            if track_info is not None:
+                track_info.update(feed_info)
+        elif collect_links and 'html' not in content_type:
+            return [], []
+        elif parse_pool is not None:
+            length = response.headers.get('Content-Length', '')
+            # A compressed page's Content-Length isn't the size of the HTML it decodes to
+            length = int(length) if length.isdigit() and 'Content-Encoding' not in response.headers else None
+            chunks = tracer.measure_chunks(response.iter_content(STREAM_CHUNK_SIZE))
+            mp3_urls, links = parse_pool.parse_chunks(chunks, response.url, content_type, collect_links, length)
+        else:
+            chunks = tracer.measure_chunks(response.iter_content(STREAM_CHUNK_SIZE))
+            mp3_urls, links = parse_stream(chunks, response.url, content_type, collect_links=collect_links)
+        tracer.annotate(urls=len(mp3_urls))
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        final_url = response.url
+    
+    if cache is not None:
+        entry = {
+            'version': PAGE_CACHE_VERSION,
+            'final_url': final_url,  # After redirects; the links were resolved against it
+            'etag': etag,
+            'last_modified': last_modified,
+            'mp3_urls': mp3_urls,
+            'checked': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if collect_links:
+            entry['links'] = links
+        if feed_info:
+            entry['track_info'] = feed_info
+        cache[url] = entry
+    return mp3_urls, links
+
+@traced('scrape')
+def scrape_mp3_urls(url, track_info=None):
+    """
+    Scrapes all MP3 URLs from a given website, podcast feed or playlist
+    
+    Args:
+        url (str): The URL of the website to scrape
+        track_info (dict): Updated in place with the titles and durations
+            given by a feed or playlist
+        
+    Returns:
+        list: List of MP3 URLs found on the website
+    """
+    try:
+        # Revalidate a cached copy of the page, or fetch and parse it as it streams in
+        cache = load_page_cache()
+        mp3_urls, _ = fetch_page(url, cache, track_info=track_info)
+        save_page_cache(cache)
+        return mp3_urls
+        
+    except requests.RequestException as e:
+        print(f"Error fetching the webpage: {e}")
+        return []
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
+
+def is_crawlable_link(link, host):
+    """Check whether a link points to another HTML page on the same site"""
+    parsed = urlparse(link)
+    if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() != host:
+        return False
+    return not parsed.path.lower().endswith(NON_PAGE_EXTENSIONS)
+
+@traced('crawl')
+def crawl_mp3_urls(url, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                   max_workers=CRAWL_WORKERS, per_host_limit=CRAWL_PER_HOST, track_info=None,
+                   parse_processes=PARSE_PROCESSES):
+    """
+    Scrapes MP3 URLs from a page and from the same-site pages it links to
+    
+    Pages are visited breadth-first, one depth level at a time. The pages of a
+    level are fetched concurrently over a shared connection pool, with at most
+    per_host_limit requests in flight to any one host. Large pages are
+    parsed in a pool of parse_processes worker processes, so parsing uses
+    every core while the threads keep fetching.
+    
+    Args:
+        url (str): The URL of the page to start crawling from
+        max_depth (int): How many links away from the start page to follow
+        max_pages (int): Maximum number of pages to fetch
+        max_workers (int): Maximum number of pages fetched at the same time
+        per_host_limit (int): Maximum number of concurrent requests per host
+        track_info (dict): Updated in place with the titles and durations
+            given by feeds and playlists found on the way
+        parse_processes (int): Worker processes for parsing large pages;
+            1 parses everything in the fetching threads
+        
+    Returns:
+        list: Deduplicated MP3 URLs in the order the crawl found them
+    """
+    session = create_session(per_host_limit)
+    cache = load_page_cache()
+    parse_pool = ParsePool(parse_processes)
+    host_slots = {}
+    host_slots_lock = threading.Lock()
+    
+    def fetch(page_url):
+        host = urlparse(page_url).netloc.lower()
+        with host_slots_lock:
+            slots = host_slots.setdefault(host, threading.Semaphore(per_host_limit))
+        try:
+            with slots:
+                return fetch_page(page_url, cache, session, collect_links=True, track_info=track_info,
+                                  parse_pool=parse_pool)
+        except requests.RequestException as e:
+            print(f"Error fetching {page_url}: {e}")
+        except Exception as e:
+            print(f"An error occurred on {page_url}: {e}")
+        return [], []
+    
+    start_url = canonical_url(url)
+    host = urlparse(start_url).netloc
+    seen = {start_url}  # Pages queued, and the start page's redirect target, so each is fetched once
+    pages = 1  # Pages queued; counted apart from seen, which can hold two URLs for the start page
+    frontier = [start_url]
+    mp3_urls = {}  # Insertion-ordered set
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for depth in range(max_depth + 1):
+                if not frontier:
+                    break
+                next_frontier = []
+                # map() keeps page order, so the playlist order is deterministic
+                for page_mp3_urls, links in executor.map(fetch, frontier):
+                    for mp3_url in page_mp3_urls:
+                        mp3_urls.setdefault(mp3_url, None)
+                    if depth == max_depth:
+                        continue
+                    if depth == 0:
+                        # The start page may redirect to another host, e.g. www.example.com
+                        final_url = canonical_url(cache.get(start_url, {}).get('final_url') or start_url)
+                        host = urlparse(final_url).netloc
+                        seen.add(final_url)
+                    for link in links:  # Canonical, so spelling variants of a page are fetched once
+                        if pages >= max_pages:
+                            break
+                        if link not in seen and is_crawlable_link(link, host):
+                            seen.add(link)
+                            pages += 1
+                            next_frontier.append(link)
+                frontier = next_frontier
+    finally:
+        session.close()
+        parse_pool.close()
+        save_page_cache(cache)
+    
+    tracer.annotate(pages=pages, urls=len(mp3_urls))
+    return list(mp3_urls)
+
+# MPEG audio header tables, indexed by the bit fields of a frame header
+MPEG_BITRATES = {  # (version is MPEG-1, layer) -> kbps by bitrate index
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+ID3V2_TEXT_FRAMES = {b'TIT2': 'title', b'TPE1': 'artist', b'TT2': 'title', b'TP1': 'artist'}
+ID3_ENCODINGS = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')
+
+def parse_frame_header(data, offset=0):
+    """
+    Decodes the 4-byte MPEG audio frame header at offset
+    
+    Returns:
+        dict: Frame properties, or None if the bytes aren't a valid header
+    """
+    if len(data) < offset + 4:
+        return None
+    b1, b2, b3, b4 = data[offset:offset + 4]
+    if b1 != 0xFF or b2 & 0xE0 != 0xE0:
+        return None
+    version = (b2 >> 3) & 3  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer = 4 - ((b2 >> 1) & 3)
+    bitrate_index = b3 >> 4
+    sample_rate_index = (b3 >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MPEG_BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (b3 >> 1) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate * 1000 // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        samples, length = 576, 72 * bitrate * 1000 // sample_rate + padding
+    else:
+        samples, length = 1152, 144 * bitrate * 1000 // sample_rate + padding
+    return {
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'mono': b4 >> 6 == 3,
+        'samples': samples,
+        'length': length,
+    }
+
+def find_first_frame(data):
+    """
+    Finds the first MPEG frame whose successor (when in range) is also a frame
+    
+    Returns:
+        tuple: (offset, frame header dict), or (None, None) if there is none
+    """
+    offset = data.find(b'\xff')
+    while 0 <= offset < len(data) - 4:
+        frame = parse_frame_header(data, offset)
+        if frame:
+            following = offset + frame['length']
+            if following + 4 > len(data) or parse_frame_header(data, following):
+                return offset, frame
+        offset = data.find(b'\xff', offset + 1)
+    return None, None
+
+def parse_vbr_header(data, offset, frame):
+    """
+    Reads the frame and byte counts from a Xing/Info or VBRI header
+    
+    Returns:
+        tuple: (frame count, audio byte count), either of which may be None
+    """
+    if frame['mpeg1']:
+        side_info = 17 if frame['mono'] else 32
+    else:
+        side_info = 9 if frame['mono'] else 17
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        position = xing + 8
+        frames = audio_bytes = None
+        if flags & 1:
+            frames = int.from_bytes(data[position:position + 4], 'big')
+            position += 4
+        if flags & 2:
+            audio_bytes = int.from_bytes(data[position:position + 4], 'big')
+        return frames, audio_bytes
+    vbri = offset + 36
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        audio_bytes = int.from_bytes(data[vbri + 10:vbri + 14], 'big')
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], 'big')
+        return frames, audio_bytes
+    return None, None
+
+def synchsafe_int(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def decode_id3_text(data):
+    encoding = ID3_ENCODINGS[data[0]] if data and data[0] < len(ID3_ENCODINGS) else 'latin-1'
+    text = data[1:].decode(encoding, errors='replace')
+    return text.split('\x00')[0].strip()
+
+def parse_id3v2(data):
+    """
+    Reads the tag size and the title/artist text frames of an ID3v2 tag
+    
+    Frames are read only as far as data reaches, so a truncated tag (e.g.
+    the start of a file with large embedded artwork) still yields the text
+    frames that come before the picture.
+    
+    Returns:
+        tuple: (total tag size in bytes, dict of tags found)
+    """
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0, {}
+    major, flags = data[3], data[5]
+    size = 10 + synchsafe_int(data[6:10]) + (10 if flags & 0x10 else 0)
+    tags = {}
+    position = 10
+    if flags & 0x40:  # Extended header
+        ext_size = int.from_bytes(data[10:14], 'big')
+        position += synchsafe_int(data[10:14]) if major >= 4 else ext_size + 4
+    id_length, header_length = (3, 6) if major == 2 else (4, 10)
+    end = min(size, len(data))
+    while position + header_length <= end:
+        frame_id = data[position:position + id_length]
+        if not frame_id.strip(b'\x00'):
+            break  # Padding
+        size_bytes = data[position + id_length:position + header_length - (0 if major == 2 else 2)]
+        if major == 2:
+            frame_size = int.from_bytes(size_bytes, 'big')
+        elif major >= 4:
+            frame_size = synchsafe_int(size_bytes)
+        else:
+            frame_size = int.from_bytes(size_bytes, 'big')
+        body = data[position + header_length:position + header_length + frame_size]
+        if frame_id in ID3V2_TEXT_FRAMES and len(body) == frame_size:
+            text = decode_id3_text(body)
+            if text:
+                tags[ID3V2_TEXT_FRAMES[frame_id]] = text
+        position += header_length + frame_size
+    return size, tags
+
+def content_fingerprint(total_size, head, tail):
+    """
+    Identifies a file by its size and the bytes at both of its ends
+    
+    Mirrors, links with different CDN tokens and re-uploads of the same file
+    get the same fingerprint, and it only takes the Range reads a metadata
+    probe makes anyway. Files differing only somewhere in the middle are not
+    told apart, which is unlikely for audio of exactly the same size.
+    
+    Args:
+        total_size (int): Size of the whole file
+        head (bytes): The start of the file, at least FINGERPRINT_BYTES long
+            (or the whole file if it is shorter)
+        tail (bytes): The last FINGERPRINT_BYTES of the file
+        
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.blake2b(str(total_size).encode(), digest_size=16)
+    digest.update(head[:FINGERPRINT_BYTES])
+    digest.update(tail)
+    return digest.hexdigest()
+
+def parse_mp3_metadata(head, total_size, read):
+    """
+    Works out duration, bitrate, title and artist from a few parts of an MP3
+    
+    Args:
+        head (bytes): The first PROBE_HEAD_BYTES of the file
+        total_size (int): Size of the whole file, or None if unknown
+        read (callable): read(offset, length) returning bytes from the file,
+            used for the first frame when the ID3v2 tag is larger than head
+            and for the end of the file (ID3v1 trailer and fingerprint)
+            
+    Returns:
+        dict: 'duration' (seconds), 'bitrate' (kbps), 'title', 'artist',
+        'size' and 'fingerprint' (see content_fingerprint()); keys whose
+        value could not be determined are left out. Ogg, FLAC and WAV files
+        only get a size and fingerprint.
+    """
+    info = {}
+    if total_size:
+        info['size'] = total_size
+    tail = b''
+    if total_size and total_size >= 128:
+        tail_size = min(total_size, FINGERPRINT_BYTES)
+        tail = read(total_size - tail_size, tail_size)
+        if len(tail) < tail_size:
+            tail = b''  # The end of the file isn't available (yet)
+        elif len(head) >= tail_size:
+            info['fingerprint'] = content_fingerprint(total_size, head, tail)
+    if head[:4] in NON_MPEG_MAGIC:
+        return info  # Ogg, FLAC and WAV data can look like MPEG frames by chance
+    
+    tag_size, tags = parse_id3v2(head)
+    info.update(tags)
+    
+    if tag_size + PROBE_FRAME_BYTES <= len(head):
+        frame_data = head[tag_size:]
+    else:
+        frame_data = read(tag_size, PROBE_FRAME_BYTES)
+    offset, frame = find_first_frame(frame_data)
+    
+    trailer_size = 0
+    trailer = tail[-128:]
+    if trailer[:3] == b'TAG':
+        trailer_size = 128
+        for key, field in (('title', trailer[3:33]), ('artist', trailer[33:63])):
+            text = field.split(b'\x00')[0].decode('latin-1').strip()
+            if text and key not in info:
+                info[key] = text
+    
+    if frame:
+        frames, audio_bytes = parse_vbr_header(frame_data, offset, frame)
+        if frames:
+            info['duration'] = frames * frame['samples'] / frame['sample_rate']
+            if audio_bytes and info['duration']:
+                info['bitrate'] = round(audio_bytes * 8 / info['duration'] / 1000)
+            else:
+                info['bitrate'] = frame['bitrate']
+        elif total_size:
+            # Constant bitrate: the audio bytes divided by the byte rate
+            audio_size = total_size - tag_size - offset - trailer_size
+            info['bitrate'] = frame['bitrate']
+            info['duration'] = audio_size * 8 / (frame['bitrate'] * 1000)
+    return info
+
+def read_mp3_metadata(path, total_size=None):
+    """
+    Reads the metadata of a local MP3 file without decoding it
+    
+    Args:
+        path (str): The MP3 file
+        total_size (int): Final size of the file, if it is still being downloaded
+        
+    Returns:
+        dict: See parse_mp3_metadata()
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        
+        def read(offset, length):
+            if offset >= size:
+                return b''  # Not downloaded yet
+            f.seek(offset)
+            return f.read(length)
+        
+        return parse_mp3_metadata(read(0, PROBE_HEAD_BYTES), max(total_size or 0, size), read)
+
+class SeekTable:
+    """
+    Byte offset of every MPEG frame of a local MP3, for frame-accurate seeks
+    
+    All frames of a file last samples / sample_rate seconds, so the frame
+    playing at any time is one division away, whatever the bitrate does.
+    Offsets are kept in an array of 4-byte integers (8 for files over 4 GB).
+    """
+    def __init__(self, offsets, samples, sample_rate):
+        self.offsets = offsets
+        self.samples = samples
+        self.sample_rate = sample_rate
+    
+    @property
+    def frame_seconds(self):
+        return self.samples / self.sample_rate
+    
+    @property
+    def duration(self):
+        return len(self.offsets) * self.frame_seconds
+    
+    def locate(self, seconds):
+        """
+        Finds the frame playing at a given time
+        
+        Returns:
+            tuple: (byte offset of the frame, time in seconds the frame starts at)
+        """
+        index = min(max(int(seconds / self.frame_seconds), 0), len(self.offsets) - 1)
+        return self.offsets[index], index * self.frame_seconds
+    
+    @classmethod
+    def build(cls, path):
+        """
+        Scans the frame headers of a file, hopping from frame to frame
+        
+        Returns:
+            SeekTable: The table, or None if no MPEG audio was found
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 4:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return cls._scan(data, size)
+    
+    @classmethod
+    def _scan(cls, data, size):
+        if data[:4] in NON_MPEG_MAGIC:
+            return None  # Ogg, FLAC and WAV data can look like frame headers by chance
+        tag_size, _ = parse_id3v2(data[:10])
+        first, frame = find_first_frame(data[tag_size:tag_size + PROBE_FRAME_BYTES])
+        if frame is None:
+            return None
+        samples, sample_rate = frame['samples'], frame['sample_rate']
+        position = tag_size + first
+        end = size - 128 if data[size - 128:size - 125] == b'TAG' else size
+        if parse_vbr_header(data[position:position + PROBE_FRAME_BYTES], 0, frame) != (None, None):
+            position += frame['length']  # The Xing/VBRI frame holds no audio
+        
+        def resync(position):
+            # Lost sync (junk or a damaged frame): find a header followed by another
+            while True:
+                position = data.find(b'\xff', position, end)
+                if position < 0 or position + 4 > end:
+                    return end
+                header = parse_frame_header(data, position)
+                if header and header['sample_rate'] == sample_rate:
+                    following = position + header['length']
+                    if following + 4 > end or parse_frame_header(data, following):
+                        return position
+                position += 1
+        
+        offsets = array.array('I' if size < 2**32 else 'Q')
+        lengths = {}  # Second and third header bytes -> frame length, or 0 if not a usable header
+        while position + 4 <= end:
+            length = 0
+            if data[position] == 0xFF:
+                key = data[position + 1] << 8 | data[position + 2]
+                length = lengths.get(key)
+                if length is None:
+                    header = parse_frame_header(data, position)
+                    usable = header and header['samples'] == samples and header['sample_rate'] == sample_rate
+                    length = lengths[key] = header['length'] if usable else 0
+            if length and position + length <= end:
+                offsets.append(position)
+                position += length
+            else:
+                position = resync(position + 1)
+        if not offsets:
+            return None
+        return cls(offsets, samples, sample_rate)
+    
+    def save(self, path, size, mtime_ns):
+        """Writes the table to path, tagged with the size and mtime of the MP3 it describes"""
+        # A unique name, as another thread or instance may be saving the same table
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack(SEEK_TABLE_HEADER, SEEK_TABLE_MAGIC, size, mtime_ns, self.samples,
+                                self.sample_rate, self.offsets.typecode.encode()))
+            self.offsets.tofile(f)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path, size, mtime_ns):
+        """
+        Reads a table written by save()
+        
+        Returns:
+            SeekTable: The table, or None if it is missing or describes another version of the file
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(struct.calcsize(SEEK_TABLE_HEADER))
+                magic, saved_size, saved_mtime, samples, sample_rate, typecode = struct.unpack(
+                    SEEK_TABLE_HEADER, header)
+                if magic != SEEK_TABLE_MAGIC or (saved_size, saved_mtime) != (size, mtime_ns):
+                    return None
+                offsets = array.array(typecode.decode())
+                offsets.frombytes(f.read())
+                return cls(offsets, samples, sample_rate)
+        except (OSError, struct.error, ValueError):
+            return None
+
+def get_seek_table(path):
+    """
+    Returns the seek table of a complete local MP3, building and caching it on first use
+    
+    The table is kept next to the file (path + SEEK_TABLE_SUFFIX) and
+    rebuilt if the file has changed since.
+    
+    Returns:
+        SeekTable: The table, or None if the file holds no MPEG audio
+    """
+    stat = os.stat(path)
+    table_path = path + SEEK_TABLE_SUFFIX
+    table = SeekTable.load(table_path, stat.st_size, stat.st_mtime_ns)
+    if table is None:
+        with tracer.span('seek_table', bytes=stat.st_size):
+            table = SeekTable.build(path)
+        if table:
+            try:
+                table.save(table_path, stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                print(f"Error saving seek table: {e}")
+    return table
+
+def range_get(url, offset, length, session=None, transfer=None):
+    """
+    Fetches part of a remote file with an HTTP Range request
+    
+    If the server ignores the Range header, only the requested number of
+    bytes are read from the start of the body before the connection is
+    closed, and nothing is returned for ranges that don't start at zero.
+    
+    Returns:
+        tuple: (bytes, total size of the file or None, whether ranges are supported)
+    """
+    if transfer is not None:
+        scheduler.throttle(transfer, length)
+    get = session.get if session else requests.get
+    headers = {'Range': f"bytes={offset}-{offset + length - 1}"}
+    with get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            data = response.raw.read(length, decode_content=True)
+            tracer.add('bytes', len(data))
+            return data, int(total) if total.isdigit() else None, True
+        total = response.headers.get('Content-Length', '')
+        total = int(total) if total.isdigit() else None
+        if offset:
+            return b'', total, False
+        data = response.raw.read(length, decode_content=True)
+        tracer.add('bytes', len(data))
+        return data, total, False
+
+@traced('probe')
+def probe_mp3_metadata(url, session=None):
+    """
+    Reads the metadata of a remote MP3 using a few small Range requests
+    
+    Fetches the start of the file (the ID3v2 tag and first frame with its
+    Xing/VBRI header) and the ID3v1 trailer instead of the whole file.
+    
+    Args:
+        url (str): The URL of the MP3 file
+        session (requests.Session): Session to send the requests with
+        
+    Returns:
+        dict: See parse_mp3_metadata()
+    """
+    with scheduler.transfer(url, PRIORITY_BACKGROUND) as transfer:
+        head, total_size, supports_range = range_get(url, 0, PROBE_HEAD_BYTES, session, transfer)
+        
+        def read(offset, length):
+            if not supports_range:
+                return b''
+            return range_get(url, offset, length, session, transfer)[0]
+        
+        return parse_mp3_metadata(head, total_size, read)
+
+def probe_tracks(mp3_urls, max_workers=PROBE_WORKERS, on_result=None):
+    """
+    Probes the metadata of many MP3 URLs concurrently
+    
+    Args:
+        mp3_urls (list): URLs to probe
+        max_workers (int): Maximum number of probes in flight
+        on_result (callable): Called as on_result(url, info) as each probe
+            finishes; returning False stops the remaining probes
+            
+    Returns:
+        dict: URL -> metadata dict for every probe that succeeded
+    """
+    results = {}
+    session = scheduler.session
+    stopped = threading.Event()
+    
+    def probe(url):
+        if stopped.is_set():
+            return
+        try:
+            info = probe_mp3_metadata(url, session)
+        except Exception as e:
+            print(f"Error probing {url}: {e}")
+            return
+        results[url] = info
+        if on_result and on_result(url, info) is False:
+            stopped.set()
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(probe, mp3_urls))
+    return results
+
+class DownloadCancelled(Exception):
+    """Raised when a download is stopped through its cancel event"""
+
+class AudioCache:
+    """
+    Persistent, size-bounded store for downloaded tracks
+    
+    Files are stored once per SHA-256 of their content, so the same audio
+    reached through different URLs takes space only once. An index maps each
+    URL to its content hash and records when every file was last used; the
+    least recently used files are evicted when the cache grows past
+    max_bytes. Several players may share the directory, so the index on disk
+    is merged in before every save.
+    
+    lookup() runs on the UI thread and only compares a file's size and mtime
+    with the index. The first time a file is used in a session its hash is
+    checked again on a background thread, and files that fail the check are
+    dropped. Index saves caused by a lookup are made on that thread too.
+    """
+    def __init__(self, directory=None, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        # Relative to the working directory when the cache is opened, like the other storage files
+        self.directory = os.path.abspath(directory or AUDIO_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.lock = threading.RLock()
+        self.verified = set()  # Hashes checked during this session
+        self.verifying = set()  # Hashes waiting for the background check
+        self.pinned = set()  # Hashes that must not be evicted, e.g. the playing track
+        self.removed = {}  # Hash -> when this instance dropped it, so merges don't bring it back
+        self.forgotten = set()  # URLs discarded by this instance
+        self.verifier = ThreadPoolExecutor(max_workers=1)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index = self._load_index()
+    
+    def _load_index(self):
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+                if 'urls' in index and 'files' in index:
+                    return index
+        except Exception as e:
+            print(f"Error loading audio cache index: {e}")
+        return {'urls': {}, 'files': {}}
+    
+    def _merge_index(self):
+        """Take in files and uses recorded by other players since the index was read"""
+        disk = self._load_index()
+        files = {}
+        for sha256, entry in self.index['files'].items():
+            # Keep a file the disk index lacks only if another player didn't evict it
+            if sha256 in disk['files'] or os.path.exists(self.path_for_hash(sha256)):
+                files[sha256] = entry
+        for sha256, entry in disk['files'].items():
+            if sha256 in files:
+                files[sha256]['last_used'] = max(files[sha256].get('last_used', 0), entry.get('last_used', 0))
+            elif entry.get('last_used', 0) > self.removed.get(sha256, 0):
+                files[sha256] = entry
+        urls = {url: sha256 for url, sha256 in disk['urls'].items() if url not in self.forgotten}
+        urls.update(self.index['urls'])
+        self.index = {'urls': {url: sha256 for url, sha256 in urls.items() if sha256 in files},
+                      'files': files}
+    
+    def _save_index(self, merge=True):
+        if merge:
+            self._merge_index()
+        try:
+            tmp_path = f'{self.index_path}.{os.getpid()}.tmp'  # Other players may be saving too
+            with open(tmp_path, 'w') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"Error saving audio cache index: {e}")
+    
+    def path_for_hash(self, sha256, extension=None):
+        """Where the file with this hash is kept, under the extension of the URL it came from"""
+        if extension is None:
+            extension = self.index['files'].get(sha256, {}).get('extension', '.mp3')
+        return os.path.join(self.directory, sha256[:2], sha256 + extension)
+    
+    def lookup(self, url):
+        """
+        Finds the cached file for a URL
+        
+        Returns:
+            str: Path of the cached file, or None if the URL isn't cached
+        """
+        with self.lock:
+            sha256 = self.index['urls'].get(url)
+            entry = self.index['files'].get(sha256)
+            if entry is None:
+                return None
+            path = self.path_for_hash(sha256)
+            if sha256 not in self.verified:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    stat = None
+                if sha256 not in self.verifying:
+                    self.verifying.add(sha256)
+                    self.verifier.submit(self._verify, sha256)
+                if stat is None or stat.st_size != entry['size']:
+                    return None  # The check drops it
+                if entry.get('mtime') not in (None, stat.st_mtime):
+                    return None  # Changed since it was stored; usable again once the hash checks out
+            now = time.time()
+            if now - entry.get('last_used', 0) >= AUDIO_CACHE_TOUCH_INTERVAL:
+                entry['last_used'] = now
+                self.verifier.submit(self._save_index_locked)
+            return path
+    
+    def _save_index_locked(self):
+        # Runs on the verifier thread, so the UI thread never writes the index
+        with self.lock:
+            self._save_index()
+    
+    def _verify(self, sha256):
+        """Hash a cached file on the verifier thread, dropping it if the content doesn't match"""
+        path = self.path_for_hash(sha256)
+        digest = hashlib.sha256()
+        try:
+            if os.path.getsize(path) != self.index['files'].get(sha256, {}).get('size'):
+                raise OSError(f"{path} is the wrong size")
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            mtime = os.path.getmtime(path)
+        except OSError:
+            digest = None
+        with self.lock:
+            self.verifying.discard(sha256)
+            entry = self.index['files'].get(sha256)
+            if entry is None:
+                return
+            if digest is None or digest.hexdigest() != sha256:
+                print(f"Cached file {path} failed its integrity check, dropping it")
+                self._remove(sha256)
+                self._save_index()
+                return
+            self.verified.add(sha256)
+            if entry.get('mtime') != mtime:
+                entry['mtime'] = mtime
+                self._save_index()
+    
+    def add(self, url, path, sha256):
+        """
+        Stores a downloaded file for a URL, leaving the original file in place
+        
+        Args:
+            url (str): The URL the file was downloaded from
+            path (str): The downloaded file
+            sha256 (str): Hex SHA-256 of the file's content
+            
+        Returns:
+            str: Path of the cached copy
+        """
+        with self.lock:
+            cached_path = self.path_for_hash(sha256)
+            if sha256 not in self.index['files'] or not os.path.exists(cached_path):
+                extension = os.path.splitext(path)[1] or '.mp3'
+                cached_path = self.path_for_hash(sha256, extension)
+                os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+                tmp_path = cached_path + '.tmp'
+                try:
+                    os.link(path, tmp_path)
+                except OSError:
+                    shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, cached_path)
+                stat = os.stat(cached_path)
+                self.index['files'][sha256] = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                                               'extension': extension}
+            self.verified.add(sha256)
+            self.index['files'][sha256]['last_used'] = time.time()
+            self.index['urls'][url] = sha256
+            self.forgotten.discard(url)
+            self._merge_index()  # Count files other players added before evicting
+            self._evict()
+            self._save_index(merge=False)
+            return cached_path
+    
+    def discard(self, url):
+        """Forget a URL, removing its file if no other URL uses it"""
+        with self.lock:
+            sha256 = self.index['urls'].pop(url, None)
+            self.forgotten.add(url)
+            if sha256 and sha256 not in self.index['urls'].values():
+                self._remove(sha256)
+            self._save_index()
+    
+    def pin(self, path):
+        """Protect the file at path from eviction; pass None to unpin"""
+        with self.lock:
+            self.pinned = set()
+            if path and os.path.dirname(os.path.dirname(path)) == self.directory:
+                self.pinned.add(os.path.splitext(os.path.basename(path))[0])
+    
+    def _remove(self, sha256):
+        path = self.path_for_hash(sha256)
+        self.index['files'].pop(sha256, None)
+        self.verified.discard(sha256)
+        self.removed[sha256] = time.time()
+        for url in [u for u, h in self.index['urls'].items() if h == sha256]:
+            del self.index['urls'][url]
+            self.forgotten.add(url)
+        for path in (path, path + SEEK_TABLE_SUFFIX):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def _evict(self):
+        total = sum(entry['size'] for entry in self.index['files'].values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(self.index['files'].items(), key=lambda item: item[1].get('last_used', 0))
+        for sha256, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if sha256 in self.pinned:
+                continue
+            total -= entry['size']
+            self._remove(sha256)
+
+class StreamingDownload:
+    """
+    Downloads a file in chunks so it can be read while it is still arriving
+    
+    The file is written in place and flushed after every chunk. wait_for()
+    blocks until a given number of bytes is on disk, which lets playback start
+    once a buffer is filled rather than when the whole file is done. A
+    download that is cancelled or fails deletes its partial file.
+    """
+    def __init__(self, url, path, session=None, priority=PRIORITY_PREFETCH):
+        self.url = url
+        self.path = path
+        self.session = session
+        self.priority = priority
+        self.transfer = None  # Scheduler handle while the download runs
+        self.bytes_done = 0
+        self.total = None  # From Content-Length, when the server sends it
+        self.sha256 = None  # Hex digest of the content once the download is complete
+        self.started_at = None
+        self.error = None
+        self.finished = threading.Event()
+        self.cancel_event = threading.Event()
+        self.condition = threading.Condition()
+    
+    @property
+    def complete(self):
+        return self.finished.is_set() and self.error is None
+    
+    @property
+    def rate(self):
+        """Average download speed in bytes per second"""
+        if not self.started_at:
+            return 0
+        return self.bytes_done / max(time.monotonic() - self.started_at, 1e-3)
+    
+    def start(self):
+        """Run the download in a background thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+    
+    @traced('stream_download')
+    def run(self):
+        """Run the download in the calling thread"""
+        get = self.session.get if self.session else scheduler.session.get
+        self.started_at = time.monotonic()
+        try:
+            with scheduler.transfer(self.url, self.priority, self.cancel_event) as transfer:
+                self.transfer = transfer
+                if transfer.priority != self.priority:
+                    scheduler.set_priority(transfer, self.priority)  # Changed while registering
+                scheduler.throttle(transfer, 0)  # Don't even connect while more urgent tracks download
+                if self.cancel_event.is_set():
+                    raise DownloadCancelled(self.url)  # The wait above ends early on cancel
+                with get(self.url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                    response.raise_for_status()
+                    if response.headers.get('Content-Length', '').isdigit():
+                        self.total = int(response.headers['Content-Length'])
+                    digest = hashlib.sha256()
+                    with open(self.path, 'wb') as f:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            scheduler.throttle(transfer, len(chunk))
+                            if self.cancel_event.is_set():
+                                raise DownloadCancelled(self.url)
+                            f.write(chunk)
+                            f.flush()
+                            digest.update(chunk)
+                            with self.condition:
+                                self.bytes_done += len(chunk)
+                                self.condition.notify_all()
+                    self.sha256 = digest.hexdigest()
+        except Exception as e:
+            self.error = e
+            try:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            except:
+                pass
+        finally:
+            tracer.annotate(url=self.url, bytes=self.bytes_done)
+            with self.condition:
+                self.finished.set()
+                self.condition.notify_all()
+    
+    def wait_for(self, num_bytes, timeout=None):
+        """
+        Blocks until num_bytes are on disk or the download has finished
+        
+        Returns:
+            int: Number of bytes on disk
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.bytes_done >= num_bytes or self.finished.is_set(),
+                                    timeout)
+            return self.bytes_done
+    
+    def set_priority(self, priority):
+        """Moves the download to another scheduler priority class"""
+        self.priority = priority
+        transfer = self.transfer
+        if transfer is not None:
+            scheduler.set_priority(transfer, priority)
+    
+    def cancel(self):
+        self.cancel_event.set()
+
+class TrackPrefetcher:
+    """
+    Downloads the tracks around the current one in a background thread
+    
+    After each track change, schedule() moves the prefetch window to the next
+    `ahead` and previous `behind` tracks. Files outside the window are deleted
+    and downloads that are no longer wanted are cancelled. Tracks found in the
+    audio cache are played from there, and finished downloads are added to it.
+    """
+    def __init__(self, mp3_urls, temp_dir, ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND, cache=None):
+        self.mp3_urls = mp3_urls
+        self.temp_dir = temp_dir
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.session = scheduler.session
+        self.condition = threading.Condition()
+        self.wanted = []  # Track indexes still to download, most important first
+        self.streams = {}  # Track index -> StreamingDownload still in progress
+        self.playing = None  # Index of the track last asked for by fetch()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def download_path(self, index):
+        return os.path.join(self.temp_dir, f"track_{index}{audio_extension(self.mp3_urls[index])}")
+    
+    def path_for(self, index):
+        """Local file for a track: the cached copy if there is one, else the download"""
+        if self.cache and index not in self.streams:
+            cached_path = self.cache.lookup(self.mp3_urls[index])
+            if cached_path:
+                return cached_path
+        return self.download_path(index)
+    
+    def is_local(self, index):
+        return index not in self.streams and os.path.exists(self.path_for(index))
+    
+    def window(self, current):
+        after = range(current + 1, min(current + self.ahead + 1, len(self.mp3_urls)))
+        before = range(current - 1, max(current - self.behind - 1, -1), -1)
+        return list(after) + list(before)
+    
+    def schedule(self, current):
+        """Prefetch around the given track index and drop files outside the window"""
+        with self.condition:
+            window = self.window(current)
+            keep = set(window) | {current}
+            self.wanted = [i for i in window if i not in self.streams and not self.is_local(i)]
+            for index, stream in self.streams.items():
+                if index not in keep:
+                    stream.cancel()
+            busy = set(self.streams)
+            self.condition.notify_all()
+        for file in os.listdir(self.temp_dir):
+            name, extension = os.path.splitext(file)
+            if name.startswith('track_') and extension[1:] in AUDIO_EXTENSIONS:
+                try:
+                    index = int(name[len('track_'):])
+                except ValueError:
+                    continue
+                if index not in keep and index not in busy:
+                    for path in (os.path.join(self.temp_dir, file),
+                                 os.path.join(self.temp_dir, file + SEEK_TABLE_SUFFIX)):
+                        try:
+                            os.remove(path)
+                        except:
+                            pass
+    
+    def fetch(self, index, buffer_bytes=0):
+        """
+        Makes a track playable, downloading it now if it isn't prefetched
+        
+        If the track is already being downloaded, that download is reused
+        instead of starting a second one, unless it has been cancelled.
+        
+        Args:
+            index (int): Index of the track in mp3_urls
+            buffer_bytes (int): Bytes that must be on disk before returning
+            
+        Returns:
+            StreamingDownload: The download still filling the file, or None
+            if the file at path_for(index) is already complete
+        """
+        with self.condition:
+            if index in self.wanted:
+                self.wanted.remove(index)
+            # The track played before goes back to being an ordinary prefetch
+            previous = self.streams.get(self.playing)
+            if previous is not None and self.playing != index:
+                previous.set_priority(PRIORITY_PREFETCH)
+            self.playing = index
+            stream = self.streams.get(index)
+            while stream is not None and stream.cancel_event.is_set() and not self.stopped:
+                # schedule() gave up on this download; it deletes its partial file
+                # when it stops, so wait for that before downloading again
+                self.condition.wait()
+                stream = self.streams.get(index)
+            if stream is None:
+                if self.is_local(index):
+                    tracer.count('prefetch_hits')
+                    return None
+                tracer.count('prefetch_misses')
+                stream = self._track_stream(index)
+                threading.Thread(target=self._download, args=(index, stream), daemon=True).start()
+            stream.set_priority(PRIORITY_PLAYING)
+        stream.wait_for(buffer_bytes)
+        if stream.error:
+            raise stream.error
+        return None if stream.complete else stream
+    
+    def stop(self):
+        """Cancel the downloads in progress and stop the worker thread"""
+        with self.condition:
+            self.stopped = True
+            self.wanted = []
+            for stream in self.streams.values():
+                stream.cancel()
+            self.condition.notify_all()
+        self.thread.join(timeout=REQUEST_TIMEOUT)
+    
+    def _track_stream(self, index):
+        stream = StreamingDownload(self.mp3_urls[index], self.download_path(index), self.session)
+        self.streams[index] = stream
+        return stream
+    
+    def _download(self, index, stream):
+        stream.run()
+        if stream.error and not isinstance(stream.error, DownloadCancelled):
+            print(f"Error downloading track {index + 1}: {stream.error}")
+        elif stream.complete and self.cache:
+            try:
+                self.cache.add(stream.url, stream.path, stream.sha256)
+            except Exception as e:
+                print(f"Error caching track {index + 1}: {e}")
+        with self.condition:
+            if self.streams.get(index) is stream:
+                del self.streams[index]
+            self.condition.notify_all()
+        if stream.complete:
+            # Scan the frames now, so seeking in the track is instant once it plays
+            try:
+                get_seek_table(self.path_for(index))
+            except (OSError, ValueError) as e:
+                print(f"Error indexing track {index + 1}: {e}")
+    
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.wanted and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                index = self.wanted.pop(0)
+                stream = self._track_stream(index)
+            self._download(index, stream)
+
+TRACK_NAME_JUNK = re.compile(r'[^a-zA-Z0-9\s]+')
+TRACK_NAME_SEPARATORS = str.maketrans('_-', '  ')
+
+@traced('track_names')
+def get_track_names(mp3_urls):
+    """
+    Turns MP3 URLs into readable track names, e.g. .../My_Song%201.mp3?token=x -> My Song 1
+    
+    The whole playlist is cleaned up in one pass: the file names are joined
+    into one string so URL decoding and the character filter run once
+    instead of once per track.
+    
+    Args:
+        mp3_urls (list): List of MP3 URLs
+        
+    Returns:
+        list: One name per URL; "Track N" where nothing readable is left
+    """
+    # Extract filenames from the URLs, one per line, without query strings and extensions
+    joined = '\n'.join(os.path.basename(url.partition('?')[0].partition('#')[0]) for url in mp3_urls)
+    joined = AUDIO_NAME_SUFFIX.sub('', joined)
+    
+    # Remove URL encoding; an encoded line break must not split a name in two
+    if '%' in joined:
+        joined = unquote(joined.replace('%0A', '%20').replace('%0a', '%20'))
+    
+    # Replace underscores and hyphens with spaces, then keep only letters, numbers, and spaces
+    joined = TRACK_NAME_JUNK.sub('', joined.translate(TRACK_NAME_SEPARATORS))
+    
+    # Remove extra spaces, and name tracks that have nothing left by their number
+    names = [' '.join(name.split()) for name in joined.split('\n')] if mp3_urls else []
+    return [name or f"Track {index + 1}" for index, name in enumerate(names)]
+
+class TrackIndex:
+    """
+    Case-insensitive substring search over track names
+    
+    All names are kept lowercased in a single newline-separated string, so a
+    query that matches few tracks is a handful of str.find() calls rather
+    than a Python loop over every track. Queries matching many tracks switch
+    to a plain scan of the keys, which is cheaper per match. A query that
+    extends the previous one only re-checks the previous matches.
+    """
+    def __init__(self, names):
+        self.keys = [name.lower().replace('\n', ' ') for name in names]
+        self._text = None
+        self._starts = None
+        self._last_query = ''
+        self._last_result = None
+    
+    def update(self, index, name):
+        self.keys[index] = name.lower().replace('\n', ' ')
+        self._text = None
+        self._last_result = None
+    
+    def _build(self):
+        self._text = '\n'.join(self.keys) + '\n'
+        starts = [0]
+        for key in self.keys:
+            starts.append(starts[-1] + len(key) + 1)
+        self._starts = starts
+    
+    @traced('search')
+    def search(self, query):
+        """
+        Returns:
+            list: Indexes of the tracks whose name contains query, in order
+        """
+        query = query.lower().replace('\n', ' ').strip()
+        if not query:
+            return list(range(len(self.keys)))
+        if self._last_result is not None and self._last_query and query.startswith(self._last_query):
+            result = [i for i in self._last_result if query in self.keys[i]]
+        else:
+            if self._text is None:
+                self._build()
+            text, starts, result = self._text, self._starts, []
+            dense = max(len(self.keys) // 64, 64)
+            position = text.find(query)
+            while position >= 0:
+                index = bisect.bisect_right(starts, position) - 1
+                result.append(index)
+                if len(result) > dense:
+                    keys = self.keys
+                    result.extend(i for i in range(index + 1, len(keys)) if query in keys[i])
+                    break
+                position = text.find(query, starts[index + 1])
+        self._last_query, self._last_result = query, result
+        return result
+
+class TkWorker:
+    """
+    Runs blocking jobs on a thread pool and hands their results to the Tk thread
+    
+    Tk widgets may only be touched from the thread running the mainloop. Jobs
+    therefore never call back directly: results go through a thread-safe queue
+    that is drained by a short root.after() poll, and the callbacks run there.
+    """
+    def __init__(self, root, max_workers=WORKER_THREADS, poll_ms=WORKER_POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.results = queue.Queue()
+        self.poll_job = None
+        self.closed = False
+        self._poll()
+    
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """
+        Runs func(*args) on a worker thread
+        
+        on_done(result) or on_error(exception) is then called on the Tk thread.
+        """
+        def run():
+            try:
+                result = func(*args)
+            except Exception as e:
+                if on_error:
+                    self.post(on_error, e)
+                else:
+                    print(f"Error in background job: {e}")
+            else:
+                if on_done:
+                    self.post(on_done, result)
+        return self.executor.submit(run)
+    
+    def post(self, callback, *args):
+        """Calls callback(*args) on the Tk thread; safe to call from any thread"""
+        if not self.closed:
+            self.results.put((callback, args))
+    
+    def _poll(self):
+        self.poll_job = None
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in background job callback: {e}")
+            if self.closed:
+                return
+        self.poll_job = self.root.after(self.poll_ms, self._poll)
+    
+    def shutdown(self):
+        """Stop delivering results and drop jobs that haven't started"""
+        self.closed = True
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def format_size(num_bytes):
+    """Format a byte count for display, e.g. 1.5 MB"""
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+def load_link_cache():
+    """Load the link check results from JSON file"""
     try:
-        if os.path.exists('url_history.json'):
-            with open('url_history.json', 'r') as f:
+        if os.path.exists(LINK_CACHE_FILE):
+            with open(LINK_CACHE_FILE, 'r') as f:
                 return json.load(f)
-    except:
-        pass
-    return []
+    except (OSError, ValueError) as e:
+        print(f"Error loading link cache: {e}")
+    return {}
+
+def save_link_cache(cache):
+    """Save the link check results to JSON file, dropping results past their TTL"""
+    now = time.time()
+    cache = {url: result for url, result in cache.items()
+             if now - result.get('checked', 0) < LINK_CHECK_TTL}
+    try:
+        write_json_atomic(LINK_CACHE_FILE, cache)
+    except (OSError, ValueError) as e:
+        print(f"Error saving link cache: {e}")
 
-def save_url_history(history):
-    """Save URL history to JSON file"""
+@traced('check_link')
+def check_mp3_url(url, session=None):
+    """
+    Checks that a URL serves an audio file, without downloading it
+    
+    Sends a HEAD request, or a one-byte Range request when the server
+    doesn't answer HEAD properly, and looks at the status, Content-Type and
+    size of the answer.
+    
+    Returns:
+        dict: 'ok' (bool), 'reason' why not, 'size' in bytes if known, and
+        'checked' (time of the check)
+    """
+    get = session.get if session else requests.get
+    head = session.head if session else requests.head
+    result = {'ok': False, 'reason': None, 'size': None, 'checked': time.time()}
     try:
-        with open('url_history.json', 'w') as f:
-            json.dump(history, f)
-    except:
-        pass
-
-def add_to_history(url):
-    """Add URL to history with timestamp"""
-    history = load_url_history()
-    # Remove if already exists
-    history = [h for h in history if h['url'] != url]
-    # Add new entry
-    history.insert(0, {
-        'url': url,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
-    # Keep only last 10 entries
-    history = history[:10]
-    save_url_history(history)
-    return history
-
-def scrape_mp3_urls(url):
-    """
-    Scrapes all MP3 URLs from a given website
+        response = head(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+        size = response.headers.get('Content-Length', '')
+        if response.status_code in (403, 405, 501) or not size.isdigit():
+            # Some servers refuse HEAD or leave out the length; ask for one byte instead
+            with get(url, headers={'Range': 'bytes=0-0'}, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                size = response.headers.get('Content-Range', '').rpartition('/')[2]
+                if response.status_code == 200:
+                    size = response.headers.get('Content-Length', '')
+        if response.status_code >= 400:
+            result['reason'] = f"HTTP {response.status_code}"
+            return result
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type in PLAYLIST_CONTENT_TYPES:
+            result['reason'] = f"a playlist, not a track ({content_type})"
+            return result
+        if content_type in DOWNLOAD_CONTENT_TYPES:
+            audio_path = any(AUDIO_URL_PATTERN.search(urlparse(u).path) for u in (url, response.url))
+            if not audio_path:
+                result['reason'] = f"not audio ({content_type})"
+                return result
+        elif content_type and not (content_type.startswith('audio/') or content_type in AUDIO_CONTENT_TYPES):
+            result['reason'] = f"not audio ({content_type})"
+            return result
+        if size.isdigit():
+            result['size'] = int(size)
+            if result['size'] == 0:
+                result['reason'] = "empty file"
+                return result
+        result['ok'] = True
+    except requests.RequestException as e:
+        result['reason'] = f"unreachable ({e.__class__.__name__})"
+    return result
+
+def validate_mp3_urls(mp3_urls, max_workers=LINK_CHECK_WORKERS, cache=None):
+    """
+    Checks many MP3 URLs concurrently, reusing results younger than LINK_CHECK_TTL
     
     Args:
-        url (str): The URL of the website to scrape
-        
+        mp3_urls (list): URLs to check
+        max_workers (int): Maximum number of checks in flight
+        cache (dict): Link cache from load_link_cache(); loaded and saved
+            automatically when not given
+            
     Returns:
-        list: List of MP3 URLs found on the website
+        dict: URL -> result dict from check_mp3_url()
     """
-    try:
-        # Send GET request to the URL
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+    own_cache = cache is None
+    if own_cache:
+        cache = load_link_cache()
+    now = time.time()
+    results = {}
+    pending = []
+    for url in dict.fromkeys(mp3_urls):
+        cached = cache.get(url)
+        if cached and now - cached.get('checked', 0) < LINK_CHECK_TTL:
+            results[url] = cached
+        else:
+            pending.append(url)
+    
+    if pending:
+        session = create_session(max_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for url, result in zip(pending, executor.map(lambda u: check_mp3_url(u, session), pending)):
+                    results[url] = result
+                    if not result['reason'] or not result['reason'].startswith('unreachable'):
+                        cache[url] = result  # Network errors may be temporary, so check again next time
+        finally:
+            session.close()
+    
+    if own_cache:
+        save_link_cache(cache)
+    return results
+
+def drop_broken_urls(mp3_urls):
+    """
+    Removes the URLs that don't serve an audio file, printing why each was dropped
+    
+    Returns:
+        list: The working URLs, in their original order
+    """
+    results = validate_mp3_urls(mp3_urls)
+    for url in mp3_urls:
+        if not results[url]['ok']:
+            print(f"Skipping {url}: {results[url]['reason']}")
+    return [url for url in mp3_urls if results[url]['ok']]
+
+def drop_duplicate_tracks(mp3_urls, track_info, max_workers=PROBE_WORKERS):
+    """
+    Keeps only the first URL of every file that is served under several URLs
+    
+    Tracks whose fingerprint isn't in track_info yet are probed first, which
+    takes a few small Range requests each instead of a download. Tracks that
+    can't be fingerprinted (e.g. the server ignores Range) are all kept.
+    
+    Args:
+        mp3_urls (list): URLs in playlist order
+        track_info (dict): Known metadata per URL; probe results are added to
+            it, so the caller can store the fingerprints for the next time
+        max_workers (int): Maximum number of probes in flight
         
-        # Find all links on the page
-        mp3_urls = []
+    Returns:
+        list: The URLs with later copies left out, in their original order
+    """
+    missing = [url for url in mp3_urls if not track_info.get(url, {}).get('fingerprint')]
+    for url, info in probe_tracks(missing, max_workers).items():
+        track_info[url] = {**track_info.get(url, {}), **info}
+    
+    first_urls = {}  # Fingerprint -> first URL it was seen under
+    unique = []
+    for url in mp3_urls:
+        fingerprint = track_info.get(url, {}).get('fingerprint')
+        if fingerprint is None:
+            unique.append(url)
+        elif fingerprint in first_urls:
+            print(f"Skipping {url}: same file as {first_urls[fingerprint]}")
+        else:
+            first_urls[fingerprint] = url
+            unique.append(url)
+    return unique
+
+class TransientHTTPError(OSError):
+    """A server answer that is worth retrying, e.g. 503 Service Unavailable"""
+
+def safe_filename(url):
+    """Turn the last part of a URL into a file name that is safe to save under"""
+    name = unquote(os.path.basename(urlparse(url).path)) or 'track.mp3'
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name).strip(' .')
+    return name or 'track.mp3'
+
+@traced('bulk_download')
+def download_with_resume(url, path, session=None, retries=BULK_RETRIES, backoff=BULK_BACKOFF,
+                         on_progress=None, cancel_event=None):
+    """
+    Downloads a file, resuming a partial download and retrying transient errors
+    
+    Data goes to path + '.part' until the file is complete. If that file
+    already exists, only the rest is requested with a Range header, sent with
+    If-Range so that a file that changed on the server since is fetched
+    whole; a part whose range doesn't line up is started again. Timeouts,
+    dropped connections and 429/5xx answers are retried with exponential
+    backoff (honouring Retry-After), each retry continuing where the last
+    attempt stopped. The download runs as a background transfer of the
+    DownloadScheduler, so it pauses while a track is being streamed.
+    
+    Args:
+        url (str): The URL of the file
+        path (str): Where to save the file
+        session (requests.Session): Session to send the requests with
+            (default: the scheduler's shared session)
+        retries (int): How many times to retry after a transient error
+        backoff (float): Seconds to wait before the first retry; doubled each time
+        on_progress (callable): Called with the number of bytes of each chunk written
+        cancel_event (threading.Event): Stops the download when set, keeping the
+            partial file for a later resume
         
-        # Look for direct MP3 links in anchor tags
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            # Make URL absolute if it's relative
-            full_url = urljoin(url, href)
-            if full_url.lower().endswith('.mp3'):
-                mp3_urls.append(full_url)
-                
-        # Look for MP3 links in source tags
-        for source in soup.find_all('source'):
-            if source.get('src'):
-                src = source['src']
-                full_url = urljoin(url, src)
-                if full_url.lower().endswith('.mp3'):
-                    mp3_urls.append(full_url)
-                    
-        # Look for MP3 URLs in script tags using regex
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string:
-                mp3_matches = re.findall(r'https?://[^\s<>"\']+?\.mp3', script.string)
-                mp3_urls.extend(mp3_matches)
-        
-        # Look for MP3 URLs in data-song attributes (e.g., <span data-song="..."></span>)
-        for tag in soup.find_all(attrs={'data-song': True}):
-            data_song = tag['data-song']
-            full_url = urljoin(url, data_song)
-            if full_url.lower().endswith('.mp3'):
-                mp3_urls.append(full_url)
-        
-        return list(set(mp3_urls))  # Remove duplicates
+    Raises:
+        DownloadCancelled: If cancel_event was set before the download finished
+        requests.RequestException, TransientHTTPError: If the download fails for good
+    """
+    get = (session or scheduler.session).get
+    part_path = path + '.part'
+    validator_path = path + PART_VALIDATOR_SUFFIX
+    
+    def restart(reason):
+        for stale in (part_path, validator_path):
+            if os.path.exists(stale):
+                os.remove(stale)
+        raise TransientHTTPError(f"{reason}, restarting {url}")
+    
+    with scheduler.transfer(url, PRIORITY_BACKGROUND, cancel_event) as transfer:
+        for attempt in range(retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validator = {}
+            if offset and os.path.exists(validator_path):
+                try:
+                    with open(validator_path, 'r') as f:
+                        validator = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading {validator_path}: {e}")
+            headers = {}
+            if offset:
+                headers['Range'] = f"bytes={offset}-"
+                # Weak ETags can't be used in If-Range
+                etag = validator.get('etag') or ''
+                if_range = etag if etag and not etag.startswith('W/') else validator.get('last_modified')
+                if if_range:
+                    headers['If-Range'] = if_range
+            retry_after = None
+            try:
+                scheduler.throttle(transfer, 0)  # Don't even connect while a track is waiting for data
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled(url)  # The wait above ends early on cancel
+                with get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                    if response.status_code == 416 and offset:
+                        # Nothing left to fetch if the part file already has every byte
+                        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                        if total == str(offset) and validator:
+                            break
+                        restart("Range not satisfiable")
+                    if response.status_code in RETRY_STATUSES:
+                        retry_after = response.headers.get('Retry-After')
+                        raise TransientHTTPError(f"{response.status_code} for {url}")
+                    response.raise_for_status()
+                    # A 200 answer to a Range request means the server sent the whole file again
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    if mode == 'ab':
+                        start = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+                        if not offset or not start or int(start.group(1)) != offset:
+                            restart(f"Got range {response.headers.get('Content-Range')!r} for offset {offset}")
+                        etag = response.headers.get('ETag')
+                        if etag and validator.get('etag') and etag != validator['etag']:
+                            restart("File changed on the server")
+                    else:
+                        write_json_atomic(validator_path, {'etag': response.headers.get('ETag'),
+                                                           'last_modified': response.headers.get('Last-Modified')})
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            scheduler.throttle(transfer, len(chunk))
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise DownloadCancelled(url)
+                            f.write(chunk)
+                            tracer.add('bytes', len(chunk))
+                            if on_progress:
+                                on_progress(len(chunk))
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    TransientHTTPError) as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                tracer.add('retries')
+                print(f"Retrying {url} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+    os.replace(part_path, path)
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+
+def download_all(mp3_urls, directory, max_workers=BULK_WORKERS, per_host_limit=BULK_PER_HOST,
+                 retries=BULK_RETRIES, on_status=None, cancel_event=None):
+    """
+    Saves every MP3 into a directory using a bounded pool of parallel downloads
+    
+    Files that are already in the directory are skipped and partial files
+    from an earlier run are resumed, so an interrupted run can simply be
+    started again.
+    
+    Args:
+        mp3_urls (list): URLs of the files to download
+        directory (str): Where to save them; created if missing
+        max_workers (int): Maximum number of downloads in flight
+        per_host_limit (int): Maximum number of concurrent downloads per host
+        retries (int): Retries per file after a transient error
+        on_status (callable): Called about once a second, and at the end,
+            with a status dict (see Returns)
+        cancel_event (threading.Event): Stops the downloads when set; partial
+            files are kept and resumed by the next run
         
-    except requests.RequestException as e:
-        print(f"Error fetching the webpage: {e}")
-        return []
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return []
+    Returns:
+        dict: 'saved', 'skipped' and 'failed' file counts, 'total' files,
+        'bytes' transferred, 'seconds' elapsed and 'rate' in bytes per second
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Give same-named files from different folders distinct names
+    paths = []
+    used = set()
+    for url in mp3_urls:
+        name = safe_filename(url)
+        stem, ext = os.path.splitext(name)
+        counter = 2
+        while name.lower() in used:
+            name = f"{stem} ({counter}){ext}"
+            counter += 1
+        used.add(name.lower())
+        paths.append(os.path.join(directory, name))
+    
+    status = {'saved': 0, 'skipped': 0, 'failed': 0, 'total': len(mp3_urls),
+              'bytes': 0, 'seconds': 0.0, 'rate': 0.0}
+    lock = threading.Lock()
+    started = time.monotonic()
+    host_slots = {}
+    session = scheduler.session
+    finished = threading.Event()
+    
+    def report():
+        with lock:
+            status['seconds'] = time.monotonic() - started
+            status['rate'] = status['bytes'] / max(status['seconds'], 1e-3)
+            snapshot = dict(status)
+        if on_status:
+            on_status(snapshot)
+        return snapshot
+    
+    def reporter():
+        while not finished.wait(1.0):
+            report()
+    
+    def add_bytes(num_bytes):
+        with lock:
+            status['bytes'] += num_bytes
+    
+    def download(url, path):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        if os.path.exists(path):
+            with lock:
+                status['skipped'] += 1
+            return
+        host = urlparse(url).netloc.lower()
+        with lock:
+            slots = host_slots.setdefault(host, threading.Semaphore(per_host_limit))
+        try:
+            with slots:
+                download_with_resume(url, path, session, retries, on_progress=add_bytes,
+                                     cancel_event=cancel_event)
+            outcome = 'saved'
+        except DownloadCancelled:
+            return
+        except Exception as e:
+            print(f"Error downloading {url}: {e}")
+            outcome = 'failed'
+        with lock:
+            status[outcome] += 1
+    
+    threading.Thread(target=reporter, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(download, mp3_urls, paths))
+    finally:
+        finished.set()
+    return report()
+
+def print_download_status(status):
+    """Print a one-line summary of a download_all() status dict"""
+    done = status['saved'] + status['skipped'] + status['failed']
+    print(f"{done}/{status['total']} files ({status['failed']} failed), "
+          f"{format_size(status['bytes'])} in {status['seconds']:.1f}s at {format_size(status['rate'])}/s")
 
 # Example usage:
-def create_player_ui(mp3_urls):
+def create_player_ui(mp3_urls, prefetch_ahead=PREFETCH_AHEAD, prefetch_behind=PREFETCH_BEHIND,
+                     buffer_bytes=PLAYBACK_BUFFER_BYTES, track_info=None, exit_when_shown=False):
     """
     Creates a simple UI player for the extracted MP3 files using tkinter
     
     Args:
         mp3_urls (list): List of MP3 URLs to play
+        prefetch_ahead (int): Number of upcoming tracks to download in the background
+        prefetch_behind (int): Number of previous tracks to keep on disk
+        buffer_bytes (int): Bytes downloaded before a track starts playing
+        track_info (dict): Known metadata per URL, from probe_tracks() or a feed;
+            the remaining tracks are probed in the background
+        exit_when_shown (bool): Close the window as soon as it is on screen,
+            for measuring start-up time (see benchmarks/bench_startup.py)
     """
-    # Initialize pygame mixer
-    mixer.init()
+    import tkinter as tk
+    from tkinter import ttk, filedialog
+    
+    # pygame is loaded when the first track starts
+    mixer = LazyMixer()
     
     # Create temporary directory to store downloaded files
     temp_dir = tempfile.mkdtemp()
+    try:
+        audio_cache = AudioCache()
+    except Exception as e:
+        print(f"Error opening audio cache: {e}")
+        audio_cache = None
+    try:
+        library = Library()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error opening library: {e}")
+        library = None
+    prefetcher = TrackPrefetcher(mp3_urls, temp_dir, prefetch_ahead, prefetch_behind, audio_cache)
     current_track = 0
     is_playing = False
     current_position = 0
-    update_thread = None
+    play_offset = 0  # Track position in seconds where the last mixer.music.play() started
+    progress_job = None  # Pending root.after() call of the progress clock
     current_file = None
     paused_position = 0
     is_seeking = False
     track_length = 100  # Default track length in seconds
+    current_stream = None  # Download still filling current_file, if any
+    loaded_bytes = 0  # Size of current_file when it was last loaded into the mixer
+    is_buffering = False
+    buffer_target = 0  # Bytes that must be on disk before playback resumes
+    track_info = dict(track_info or {})
+    track_names = get_track_names(mp3_urls)
+    list_labels = []  # Listbox text of every track
+    visible = list(range(len(mp3_urls)))  # Track index shown on each listbox row
+    search_index = None
+    search_job = None
+    is_closing = False
+    loading = None  # (track index, StreamingDownload or None) while a track is being fetched
+    queued_track = None  # Track handed to mixer.music.queue() to follow the current one
+    seek_table = None  # SeekTable of current_file, once it is complete and scanned
+    seek_file = None  # File object the mixer plays from after a seek
+    source_offset = 0  # Track position in seconds where the loaded mixer source starts
+    last_played_ms = 0  # mixer.music.get_pos() at the last tick; it restarts when the queue moves on
+    load_cancel = threading.Event()  # Set when the track being fetched is no longer wanted
     
     def format_time(seconds):
         try:
@@ -146,15 +3060,18 @@ def create_player_ui(mp3_urls):
             return "0:00"
     
     def get_track_length():
+        info = track_info.get(mp3_urls[current_track], {})
+        if info.get('duration'):
+            return info['duration']
         try:
             if current_file and os.path.exists(current_file):
-                import wave
-                with wave.open(current_file, 'rb') as wav_file:
-                    frames = wav_file.getnframes()
-                    rate = wav_file.getframerate()
-                    return frames / float(rate)
-        except:
-            pass
+                total_size = current_stream.total if current_stream else None
+                info = read_mp3_metadata(current_file, total_size)
+                if info.get('duration'):
+                    track_info.setdefault(mp3_urls[current_track], {}).update(info)
+                    return info['duration']
+        except Exception as e:
+            print(f"Error reading track length: {e}")
         return 100  # Default length if can't determine
     
     def cleanup_current_file():
@@ -162,157 +3079,458 @@ def create_player_ui(mp3_urls):
         if current_file and os.path.exists(current_file):
             try:
                 mixer.music.unload()
-                os.remove(current_file)
+                close_seek_file()
+                # Files in the audio cache are kept for the next session
+                if os.path.dirname(current_file) == temp_dir:
+                    os.remove(current_file)
             except:
                 pass
         current_file = None
     
-    def get_track_name(url):
-        # Extract filename from URL and clean it up
-        filename = os.path.basename(url).replace('.mp3', '')
-        
-        # Remove URL encoding
-        try:
-            from urllib.parse import unquote
-            filename = unquote(filename)
-        except:
-            pass
-            
-        # Remove special characters and keep only letters, numbers, and spaces
-        import re
-        # Replace underscores and hyphens with spaces
-        filename = filename.replace('_', ' ').replace('-', ' ')
-        # Keep only letters, numbers, and spaces
-        filename = re.sub(r'[^a-zA-Z0-9\s]', '', filename)
-        # Remove extra spaces
-        filename = ' '.join(filename.split())
-        
-        # If the filename is empty after cleaning, return a default name
-        if not filename:
-            return f"Track {current_track + 1}"
-            
-        return filename
+    def get_display_name(index):
+        # Prefer the ID3 title and artist over the file name
+        info = track_info.get(mp3_urls[index], {})
+        if info.get('title'):
+            if info.get('artist'):
+                return f"{info['artist']} - {info['title']}"
+            return info['title']
+        return track_names[index]
+    
+    def row_of(index):
+        # visible is sorted, so the row of a track is a binary search away
+        row = bisect.bisect_left(visible, index)
+        if row < len(visible) and visible[row] == index:
+            return row
+        return None
+    
+    def select_current_row():
+        track_listbox.selection_clear(0, tk.END)
+        row = row_of(current_track)
+        if row is not None:
+            track_listbox.selection_set(row)
+            track_listbox.see(row)
+    
+    def show_rows(indexes):
+        nonlocal visible
+        visible = indexes
+        list_var.set(tuple(list_labels[i] for i in indexes))
+        if current_file or loading:
+            select_current_row()
+    
+    def on_search_changed(*args):
+        nonlocal search_job
+        if search_job is not None:
+            root.after_cancel(search_job)
+        # Wait for a pause in typing before filtering
+        search_job = root.after(SEARCH_DEBOUNCE_MS, apply_search)
+    
+    def apply_search():
+        nonlocal search_job
+        search_job = None
+        show_rows(search_index.search(search_var.get()))
+    
+    def play_first_result(event=None):
+        if visible:
+            track_listbox.selection_clear(0, tk.END)
+            track_listbox.selection_set(0)
+            play_selected_track()
+    
+    def get_list_label(index):
+        label = f"{index + 1}. {get_display_name(index)}"
+        duration = track_info.get(mp3_urls[index], {}).get('duration')
+        if duration:
+            label += f"  ({format_time(duration)})"
+        return label
+    
+    def start_probing():
+        pending = [url for url in mp3_urls if not track_info.get(url, {}).get('duration')]
+        if pending:
+            def on_result(url, info):
+                worker.post(apply_probe_result, url, info)
+                if library:
+                    # Runs on the probing thread, so the Tk thread never waits for the database
+                    try:
+                        library.save_track_info({url: info})
+                    except sqlite3.Error as e:
+                        print(f"Error saving track info: {e}")
+                return not is_closing
+            threading.Thread(target=probe_tracks, args=(pending,),
+                             kwargs={'on_result': on_result}, daemon=True).start()
+    
+    def apply_probe_result(url, info):
+        nonlocal track_length
+        track_info.setdefault(url, {}).update(info)
+        selection = track_listbox.curselection()
+        for index in url_indexes.get(url, ()):
+            list_labels[index] = get_list_label(index)
+            search_index.update(index, get_display_name(index))
+            row = row_of(index)
+            if row is not None:
+                track_listbox.delete(row)
+                track_listbox.insert(row, list_labels[index])
+                if row in selection:
+                    track_listbox.selection_set(row)
+        # Fix up the seeker if the playing track's real length just arrived
+        if url == mp3_urls[current_track] and current_file and info.get('duration'):
+            track_length = info['duration']
+            seeker.config(to=track_length)
+            total_time_label.config(text=format_time(track_length))
     
     def play_selected_track(event=None):
         nonlocal current_track, is_playing
         selection = track_listbox.curselection()
         if selection:
-            current_track = selection[0]
+            current_track = visible[selection[0]]
             track_counter.config(text=f"Track {current_track + 1} of {len(mp3_urls)}")
-            download_and_play(mp3_urls[current_track])
             is_playing = True
+            download_and_play(mp3_urls[current_track])
             play_btn.config(image=pause_img)
             play_btn.image = pause_img
             update_progress()
             play_btn.focus_set()  # Set focus to play button
     
     def download_and_play(url):
-        nonlocal current_position, current_file, paused_position, track_length
+        nonlocal current_file, current_stream, is_buffering, loading, load_cancel, queued_track
+        # Abandon any track still being fetched for an earlier skip
+        load_cancel.set()
+        load_cancel = threading.Event()
+        
+        # Release the previous file; the prefetcher deletes it once it leaves the window
+        mixer.music.unload()
+        close_seek_file()
+        queued_track = None
+        current_file = None
+        current_stream = None
+        is_buffering = False
+        
+        # Move the prefetch window now, cancelling downloads the skip made unnecessary
+        prefetcher.schedule(current_track)
+        
+        loading = (current_track, None)
+        select_current_row()
+        if prefetcher.is_local(current_track):
+            # Already on disk: start it now rather than after a round trip through the worker
+            start_track((current_track, None, prefetcher.path_for(current_track)), load_cancel)
+            return
+        title_label.config(text="Loading...")
+        worker.submit(prepare_track, current_track, load_cancel,
+                      on_done=lambda result, cancel=load_cancel: start_track(result, cancel),
+                      on_error=lambda e, cancel=load_cancel: track_failed(url, e, cancel))
+        update_progress()
+    
+    @traced('load_track')
+    def prepare_track(index, cancel):
+        # Runs on a worker thread: wait until the track has a buffer on disk
+        stream = prefetcher.fetch(index)
+        worker.post(show_loading, index, stream, cancel)
+        if stream:
+            while not cancel.is_set() and stream.wait_for(buffer_bytes, timeout=0.1) < buffer_bytes:
+                if stream.finished.is_set():
+                    break
+            if stream.error:
+                raise stream.error
+            if stream.complete:
+                stream = None
+        return index, stream, prefetcher.path_for(index)
+    
+    def show_loading(index, stream, cancel):
+        nonlocal loading
+        if not cancel.is_set():
+            loading = (index, stream)
+    
+    def start_track(result, cancel):
+        nonlocal current_file, current_stream, loaded_bytes, loading, queued_track, source_offset
+        if cancel.is_set():
+            return  # The user skipped to another track meanwhile
+        index, stream, path = result
+        loading = None
         try:
-            # Cleanup previous file if exists
-            cleanup_current_file()
-            
-            # Create new temp file
-            current_file = os.path.join(temp_dir, f"track_{current_track}.mp3")
-            
-            # Download MP3 to temp file
-            urlretrieve(url, current_file)
-            
-            # Get track length
-            track_length = get_track_length()
-            seeker.config(to=track_length)
-            total_time_label.config(text=format_time(track_length))
+            current_stream = stream
+            current_file = path
+            loaded_bytes = os.path.getsize(current_file)
             
             # Load and play the music
-            mixer.music.load(current_file)
-            mixer.music.play()
-            
-            current_position = 0
-            paused_position = 0
-            progress_var.set(0)
-            current_time_label.config(text="0:00")
+            with tracer.span('mixer_load', track=index, bytes=loaded_bytes):
+                mixer.music.load(current_file)
+            close_seek_file()
+            queued_track = None
+            source_offset = 0
+            show_track(index)
+            if is_playing:
+                play_from(0)
             update_progress()
-            title_label.config(text=get_track_name(url))
-            
-            # Update listbox selection
-            track_listbox.selection_clear(0, tk.END)
-            track_listbox.selection_set(current_track)
-            track_listbox.see(current_track)
             
         except Exception as e:
-            print(f"Error playing track: {e}")
-            title_label.config(text="Error playing track")
-            cleanup_current_file()
+            track_failed(mp3_urls[index], e, cancel)
+    
+    def show_track(index):
+        # Point the title, seeker and clock at a track that just started
+        nonlocal current_position, paused_position, track_length, seek_table
+        seek_table = None
+        if current_stream is None:
+            request_seek_table()
+        if audio_cache:
+            audio_cache.pin(current_file)
+        track_length = get_track_length()
+        seeker.config(to=track_length)
+        total_time_label.config(text=format_time(track_length))
+        current_position = 0
+        paused_position = 0
+        progress_var.set(0)
+        current_time_label.config(text="0:00")
+        title_label.config(text=get_display_name(index))
+        track_counter.config(text=f"Track {index + 1} of {len(mp3_urls)}")
+        if library:
+            worker.submit(library.record_play, mp3_urls[index])
+    
+    def queue_next_track():
+        # Hand the next track to the decoder so it starts without a gap. Only a
+        # complete file may be followed: a partial one would run into the next
+        # track where it should stop to buffer.
+        nonlocal queued_track
+        next_index = current_track + 1
+        if (queued_track is not None or current_stream is not None or loading
+                or next_index >= len(mp3_urls) or not prefetcher.is_local(next_index)):
+            return
+        try:
+            mixer.music.queue(prefetcher.path_for(next_index))
+            queued_track = next_index
+        except Exception as e:
+            print(f"Error queueing next track: {e}")
+    
+    def on_queued_track_started():
+        # The mixer moved on to the queued track by itself; catch the UI up
+        nonlocal current_track, current_file, loaded_bytes, queued_track, play_offset, source_offset
+        current_track = queued_track
+        queued_track = None
+        play_offset = 0
+        source_offset = 0
+        close_seek_file()
+        current_file = prefetcher.path_for(current_track)
+        loaded_bytes = os.path.getsize(current_file)
+        show_track(current_track)
+        select_current_row()
+        prefetcher.schedule(current_track)
+    
+    def on_track_end():
+        # Nothing was queued (the next track wasn't on disk yet, or this was the last)
+        nonlocal is_playing
+        if current_track < len(mp3_urls) - 1:
+            next_track()
+        else:
+            is_playing = False
+            play_btn.config(image=play_img)
+            play_btn.image = play_img
+    
+    def track_failed(url, error, cancel):
+        nonlocal loading
+        if cancel.is_set():
+            return
+        loading = None
+        print(f"Error playing track: {error}")
+        title_label.config(text="Error playing track")
+        download_label.config(text="")
+        cleanup_current_file()
+        # Don't serve a file the mixer couldn't play from the cache again
+        if audio_cache:
+            audio_cache.discard(url)
+    
+    def show_download_progress():
+        stream = loading[1] if loading else current_stream
+        if stream and not stream.finished.is_set():
+            text = f"Downloaded {format_size(stream.bytes_done)}"
+            if stream.total:
+                text += f" of {format_size(stream.total)}"
+            download_label.config(text=f"{text} at {format_size(stream.rate)}/s")
+        else:
+            download_label.config(text="")
+    
+    def request_seek_table():
+        # Load or build the seek table of the (complete) current file off the Tk thread
+        path = current_file
+        url = mp3_urls[current_track]
+        
+        def on_done(table):
+            nonlocal seek_table
+            if table and path == current_file:
+                seek_table = table
+                # The frame count gives the exact length, even for VBR files without a header
+                apply_probe_result(url, {'duration': table.duration})
+                if library:
+                    worker.submit(library.save_track_info, {url: {'duration': table.duration}})
+        worker.submit(get_seek_table, path, on_done=on_done)
+    
+    def close_seek_file():
+        nonlocal seek_file
+        if seek_file is not None:
+            seek_file.close()
+            seek_file = None
+    
+    def load_at(position):
+        # Load current_file and play it from position (in seconds). With a seek
+        # table the mixer gets the file positioned at the right frame, instead
+        # of decoding its way there from the start.
+        nonlocal seek_file, source_offset, current_stream, loaded_bytes
+        if current_stream is not None and current_stream.complete:
+            # The download finished after the track was loaded; this load gets the whole file
+            current_stream = None
+            loaded_bytes = os.path.getsize(current_file)
+            request_seek_table()
+        if seek_table and current_stream is None:
+            offset, start = seek_table.locate(position)
+            new_file = open(current_file, 'rb')
+            try:
+                new_file.seek(offset)
+                mixer.music.load(new_file, 'mp3')
+            except Exception:
+                new_file.close()
+                raise
+            close_seek_file()
+            seek_file = new_file
+            source_offset = start
+            position = start
+        else:
+            mixer.music.load(current_file)
+            close_seek_file()
+            source_offset = 0
+        play_from(position)
+    
+    def play_from(position):
+        nonlocal play_offset, last_played_ms
+        mixer.music.play(start=position - source_offset)
+        play_offset = position
+        last_played_ms = 0
+    
+    def get_position():
+        # get_pos() counts milliseconds played since the last play() call
+        played = mixer.music.get_pos()
+        if played < 0:
+            return play_offset
+        return play_offset + played / 1000
     
     def update_progress():
-        nonlocal current_position, update_thread, paused_position
-        if is_playing and mixer.music.get_busy() and not is_seeking:
-            current_position += 0.1
+        # (Re)start the progress clock; there is never more than one pending tick
+        nonlocal progress_job
+        if progress_job is not None:
+            root.after_cancel(progress_job)
+            progress_job = None
+        progress_tick()
+    
+    def stop_progress():
+        nonlocal progress_job
+        if progress_job is not None:
+            root.after_cancel(progress_job)
+            progress_job = None
+    
+    def progress_tick():
+        nonlocal current_position, paused_position, progress_job, last_played_ms
+        progress_job = None
+        show_download_progress()
+        if loading:
+            progress_job = root.after(PROGRESS_INTERVAL_MS, progress_tick)
+            return
+        if not is_playing or is_seeking:
+            return
+        if is_buffering:
+            if current_stream.bytes_done >= buffer_target or current_stream.finished.is_set():
+                resume_after_buffering()
+            else:
+                progress_job = root.after(PROGRESS_INTERVAL_MS, progress_tick)
+            return
+        if mixer.music.get_busy():
+            played = mixer.music.get_pos()
+            if queued_track is not None and 0 <= played < last_played_ms:
+                on_queued_track_started()
+            last_played_ms = played
+            queue_next_track()
+            current_position = get_position()
             paused_position = current_position
             progress_var.set(current_position)
             current_time_label.config(text=format_time(current_position))
-            update_thread = threading.Timer(0.1, update_progress)
-            update_thread.start()
-        else:
-            if update_thread:
-                update_thread.cancel()
+            progress_job = root.after(PROGRESS_INTERVAL_MS, progress_tick)
+        elif current_stream and (not current_stream.finished.is_set()
+                                 or current_stream.bytes_done > loaded_bytes):
+            # Playback caught up with the data that was on disk when the track was loaded
+            start_buffering()
+            progress_job = root.after(PROGRESS_INTERVAL_MS, progress_tick)
+        elif current_file:
+            on_track_end()
+    
+    def start_buffering():
+        nonlocal is_buffering, buffer_target
+        is_buffering = True
+        buffer_target = loaded_bytes + buffer_bytes
+        title_label.config(text="Buffering...")
+    
+    def resume_after_buffering():
+        nonlocal current_stream, loaded_bytes, is_buffering
+        stream = current_stream
+        is_buffering = False
+        if stream.error:
+            print(f"Error playing track: {stream.error}")
+            title_label.config(text="Error playing track")
+            return
+        title_label.config(text=get_display_name(current_track))
+        try:
+            loaded_bytes = stream.bytes_done
+            if stream.complete:
+                current_stream = None
+            # Reload the longer file and carry on where playback stopped
+            load_at(current_position)
+            if current_stream is None:
+                request_seek_table()
+            update_progress()
+        except Exception as e:
+            print(f"Error resuming playback: {e}")
     
     def on_seek_start(event):
         nonlocal is_seeking
         is_seeking = True
-        if update_thread:
-            update_thread.cancel()
+        stop_progress()
     
     def on_seek_end(event):
-        nonlocal is_seeking, current_position, paused_position
+        nonlocal is_seeking, current_position, paused_position, queued_track
         is_seeking = False
         new_position = progress_var.get()
         current_position = new_position
         paused_position = new_position
+        current_time_label.config(text=format_time(new_position))
         
-        if current_file and os.path.exists(current_file):
+        # While paused, play_pause() starts from paused_position later
+        if is_playing and current_file and os.path.exists(current_file):
             try:
-                # Calculate the position in seconds
-                position_seconds = int(new_position)
-                
-                # Stop current playback
-                mixer.music.stop()
-                
                 # Reload and play from the new position
-                mixer.music.load(current_file)
-                mixer.music.play(start=position_seconds)
-                
-                # Update the position
-                current_position = new_position
-                progress_var.set(new_position)
-                current_time_label.config(text=format_time(new_position))
+                with tracer.span('seek', position=new_position, indexed=seek_table is not None):
+                    mixer.music.stop()
+                    queued_track = None
+                    load_at(new_position)
                 
                 # Resume progress updates
-                if is_playing:
-                    update_progress()
+                update_progress()
                     
             except Exception as e:
                 print(f"Error seeking: {e}")
     
     def play_pause():
-        nonlocal is_playing, current_position, paused_position
+        nonlocal is_playing, current_position, paused_position, queued_track
         try:
             if is_playing:
                 mixer.music.pause()
+                paused_position = current_position = get_position()
                 play_btn.config(image=play_img)
                 play_btn.image = play_img
                 is_playing = False
-                if update_thread:
-                    update_thread.cancel()
+                stop_progress()
             else:
                 if not mixer.music.get_busy():
                     if current_file and os.path.exists(current_file):
-                        mixer.music.load(current_file)
+                        queued_track = None
                         current_position = paused_position
                         progress_var.set(current_position)
                         # Play from the paused position
-                        mixer.music.play(start=int(paused_position))
+                        load_at(paused_position)
                     else:
+                        is_playing = True
                         download_and_play(mp3_urls[current_track])
                 else:
                     mixer.music.unpause()
@@ -349,8 +3567,9 @@ def create_player_ui(mp3_urls):
     # Create main window
     root = tk.Tk()
     root.title("MP3 Miner")
-    root.geometry("600x400")  # Made window larger for track list
+    root.geometry("600x460")  # Made window larger for track list and save controls
     root.configure(bg='#f0f0f0')
+    worker = TkWorker(root)
     
     # Set icon if available
     app_icon = load_app_icon(root)
@@ -362,9 +3581,7 @@ def create_player_ui(mp3_urls):
     def load_button_image(filename):
         try:
             if os.path.exists(filename):
-                img = Image.open(filename).convert('RGBA')  # Force RGBA for transparency
-                img = img.resize((48, 48), Image.Resampling.LANCZOS)
-                tk_img = ImageTk.PhotoImage(img)
+                tk_img = tk.PhotoImage(file=cached_button_image(filename))
                 loaded_images.append(tk_img)  # Prevent garbage collection
                 return tk_img
             else:
@@ -399,20 +3616,31 @@ def create_player_ui(mp3_urls):
     
     ttk.Label(list_frame, text="Track List", font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
     
+    # Search box, filtering the list as you type
+    search_var = tk.StringVar()
+    search_entry = ttk.Entry(list_frame, textvariable=search_var, font=('Helvetica', 10))
+    search_entry.pack(fill=tk.X, pady=(2, 5))
+    search_var.trace_add('write', on_search_changed)
+    search_entry.bind('<Return>', play_first_result)
+    
     # Create scrollbar
     scrollbar = ttk.Scrollbar(list_frame)
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
+    # Labels and the search index are built once; the listbox gets all rows in one call
+    url_indexes = {}
+    for i, url in enumerate(mp3_urls):
+        url_indexes.setdefault(url, []).append(i)
+    list_labels = [get_list_label(i) for i in range(len(mp3_urls))]
+    search_index = TrackIndex([get_display_name(i) for i in range(len(mp3_urls))])
+    list_var = tk.StringVar(value=tuple(list_labels))
+    
     # Create listbox
-    track_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, 
+    track_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, listvariable=list_var,
                              selectmode=tk.SINGLE, font=('Helvetica', 10))
     track_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     scrollbar.config(command=track_listbox.yview)
     
-    # Populate listbox
-    for i, url in enumerate(mp3_urls):
-        track_listbox.insert(tk.END, f"{i+1}. {get_track_name(url)}")
-    
     # Bind double-click event
     track_listbox.bind('<Double-Button-1>', play_selected_track)
     
@@ -476,8 +3704,53 @@ def create_player_ui(mp3_urls):
     track_counter = ttk.Label(right_frame, text=f"Track {current_track + 1} of {len(mp3_urls)}")
     track_counter.pack(pady=5)
     
+    # Download progress of the current track
+    download_label = ttk.Label(right_frame, text="", font=('Helvetica', 9))
+    download_label.pack()
+    
+    # Save every track of the playlist to a folder
+    save_cancel = threading.Event()
+    
+    def save_all_tracks():
+        directory = filedialog.askdirectory(title="Save all tracks to")
+        if not directory:
+            return
+        save_btn.config(state='disabled')
+        save_label.config(text="Starting downloads...")
+        worker.submit(lambda: download_all(mp3_urls, directory, cancel_event=save_cancel,
+                                           on_status=lambda status: worker.post(show_save_status, status)),
+                      on_done=on_all_saved, on_error=on_save_failed)
+    
+    def show_save_status(status):
+        done = status['saved'] + status['skipped'] + status['failed']
+        save_label.config(text=f"Saved {done} of {status['total']} at {format_size(status['rate'])}/s")
+    
+    def on_all_saved(status):
+        save_btn.config(state='normal')
+        text = f"Saved {status['saved'] + status['skipped']} of {status['total']} tracks"
+        if status['failed']:
+            text += f", {status['failed']} failed"
+        save_label.config(text=text)
+    
+    def on_save_failed(error):
+        save_btn.config(state='normal')
+        save_label.config(text=f"Saving failed: {error}")
+    
+    save_btn = ttk.Button(right_frame, text="Save All Tracks...", command=save_all_tracks)
+    save_btn.pack(pady=(10, 0))
+    save_label = ttk.Label(right_frame, text="", font=('Helvetica', 9))
+    save_label.pack()
+    
     # Cleanup
     def cleanup():
+        nonlocal current_stream, is_closing
+        stop_progress()
+        load_cancel.set()
+        save_cancel.set()
+        worker.shutdown()
+        current_stream = None
+        is_closing = True
+        prefetcher.stop()
         cleanup_current_file()
         mixer.quit()
         try:
@@ -493,48 +3766,122 @@ def create_player_ui(mp3_urls):
     # Bind cleanup to window close
     root.protocol("WM_DELETE_WINDOW", lambda: [cleanup(), root.destroy()])
     
+    if exit_when_shown:
+        root.wait_visibility()
+        print("Player window shown", flush=True)
+        cleanup()
+        root.destroy()
+        return
+    
+    # Fetch durations and ID3 titles for the track list
+    start_probing()
+    
     # Start UI
     root.mainloop()
 
-def create_url_input_ui():
+def create_url_input_ui(exit_when_shown=False):
     """
     Creates a UI for URL input before showing the player
+    
+    Args:
+        exit_when_shown (bool): Close the window as soon as it is on screen,
+            for measuring start-up time (see benchmarks/bench_startup.py)
     """
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+    
     def on_submit():
         url = url_entry.get().strip()
         if not url:
             messagebox.showerror("Error", "Please enter a URL")
             return
             
-        try:
-            # Show loading state
-            submit_btn.config(state='disabled')
+        # Show loading state
+        submit_btn.config(state='disabled')
+        
+        # Get MP3 URLs in the background so the window keeps responding
+        crawl = crawl_var.get()
+        validate = validate_var.get()
+        dedupe = dedupe_var.get()
+        if crawl:
+            status_label.config(text="Crawling linked pages for MP3 files...")
+        else:
             status_label.config(text="Searching for MP3 files...")
-            root.update()
-            
-            # Get MP3 URLs
-            mp3_urls = scrape_mp3_urls(url)
-            
+        worker.submit(find_mp3_urls, url, crawl, validate, dedupe,
+                      on_done=lambda result: on_scraped(url, *result), on_error=on_scrape_failed)
+    
+    def find_mp3_urls(url, crawl, validate, dedupe):
+        # Runs on a worker thread
+        track_info = {}
+        if crawl:
+            mp3_urls = crawl_mp3_urls(url, track_info=track_info)
+        else:
+            mp3_urls = scrape_mp3_urls(url, track_info)
+        if validate and mp3_urls:
+            worker.post(status_label.config, {'text': f"Checking {len(mp3_urls)} links..."})
+            mp3_urls = drop_broken_urls(mp3_urls)
+        if dedupe and mp3_urls:
+            worker.post(status_label.config, {'text': f"Comparing {len(mp3_urls)} tracks..."})
+            if library:
+                try:
+                    track_info = {**library.track_info(mp3_urls), **track_info}
+                except sqlite3.Error as e:
+                    print(f"Error reading library: {e}")
+            mp3_urls = drop_duplicate_tracks(mp3_urls, track_info)
+        if library and mp3_urls:
+            # Remember the site, and reuse what earlier sessions probed
+            try:
+                library.save_track_info(track_info)
+                library.add_site(url, mp3_urls)
+                track_info = {**library.track_info(mp3_urls), **track_info}
+            except sqlite3.Error as e:
+                print(f"Error saving to library: {e}")
+        return mp3_urls, track_info
+    
+    def load_saved_tracks(url):
+        # Runs on a worker thread
+        mp3_urls = library.site_tracks(url)
+        if not mp3_urls:
+            raise ValueError("No tracks saved for this website yet")
+        library.add_site(url)
+        return mp3_urls, library.track_info(mp3_urls)
+    
+    def on_open_saved():
+        url = url_entry.get().strip()
+        if not url:
+            messagebox.showerror("Error", "Please enter a URL")
+            return
+        submit_btn.config(state='disabled')
+        status_label.config(text="Loading saved tracks...")
+        worker.submit(load_saved_tracks, url,
+                      on_done=lambda result: on_scraped(url, *result), on_error=on_scrape_failed)
+    
+    def on_scraped(url, mp3_urls, track_info):
+        try:
             if not mp3_urls:
                 messagebox.showerror("Error", "No MP3 files found on the website")
                 submit_btn.config(state='normal')
                 status_label.config(text="")
                 return
             
-            # Add to history
-            history = add_to_history(url)
-            update_history_dropdown(history)
-                
             # Close URL input window
+            worker.shutdown()
             root.destroy()
             
             # Show player with found URLs
-            create_player_ui(mp3_urls)
+            create_player_ui(mp3_urls, track_info=track_info)
             
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-            submit_btn.config(state='normal')
-            status_label.config(text="")
+            on_scrape_failed(e)
+    
+    def on_scrape_failed(error):
+        messagebox.showerror("Error", f"An error occurred: {str(error)}")
+        submit_btn.config(state='normal')
+        status_label.config(text="")
+    
+    def on_close():
+        worker.shutdown()
+        root.destroy()
     
     def on_history_select(event):
         selected = history_var.get()
@@ -550,8 +3897,10 @@ def create_url_input_ui():
     # Create main window
     root = tk.Tk()
     root.title("MP3 Scraper")
-    root.geometry("500x250")  # Made window taller for history
+    root.geometry("500x365")  # Made window taller for history, crawl, link check and dedupe options
     root.configure(bg='#f0f0f0')
+    worker = TkWorker(root)
+    root.protocol("WM_DELETE_WINDOW", on_close)
     
     # Set icon if available
     app_icon = load_app_icon(root)
@@ -567,7 +3916,13 @@ def create_url_input_ui():
     history_frame.pack(fill=tk.X, pady=(0, 10))
     
     # Load history
-    history = load_url_history()
+    try:
+        library = Library()
+        history = library.recent_sites()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error opening library: {e}")
+        library = None
+        history = []
     history_var = tk.StringVar()
     
     # History dropdown
@@ -581,6 +3936,11 @@ def create_url_input_ui():
     # Update dropdown with history
     update_history_dropdown(history)
     
+    # Play the tracks found last time without going online
+    saved_btn = ttk.Button(history_frame, text="Play Saved Tracks", command=on_open_saved,
+                           state='normal' if library else 'disabled')
+    saved_btn.pack(anchor=tk.E, pady=(5, 0))
+    
     # URL input label
     url_label = ttk.Label(main_frame, text="Enter website URL:", font=('Helvetica', 10))
     url_label.pack(anchor=tk.W, pady=(0, 5))
@@ -590,6 +3950,25 @@ def create_url_input_ui():
     url_entry.pack(fill=tk.X, pady=(0, 10))
     url_entry.focus()  # Set focus to URL input
     
+    # Crawl option
+    crawl_var = tk.BooleanVar(value=False)
+    crawl_check = ttk.Checkbutton(main_frame,
+                                  text=f"Also search linked pages on this site (up to {CRAWL_MAX_PAGES} pages)",
+                                  variable=crawl_var)
+    crawl_check.pack(anchor=tk.W)
+    
+    # Link check option
+    validate_var = tk.BooleanVar(value=False)
+    validate_check = ttk.Checkbutton(main_frame, text="Skip dead links and files that aren't audio",
+                                     variable=validate_var)
+    validate_check.pack(anchor=tk.W)
+    
+    # Duplicate option
+    dedupe_var = tk.BooleanVar(value=False)
+    dedupe_check = ttk.Checkbutton(main_frame, text="Play each file once, even if several links serve it",
+                                   variable=dedupe_var)
+    dedupe_check.pack(anchor=tk.W)
+    
     # Submit button
     submit_btn = ttk.Button(main_frame, text="Search MP3 Files", command=on_submit)
     submit_btn.pack(pady=10)
@@ -601,9 +3980,88 @@ def create_url_input_ui():
     # Bind Enter key to submit
     url_entry.bind('<Return>', lambda e: on_submit())
     
+    if exit_when_shown:
+        root.wait_visibility()
+        print("URL window shown", flush=True)
+        on_close()
+        return
+    
+    # requests was left out of the start-up path; import it while the user types
+    root.after(100, worker.submit, importlib.import_module, 'requests')
+    
     # Start UI
     root.mainloop()
 
+def main(argv=None):
+    """
+    Command-line entry point
+    
+    Without arguments the URL input window opens. With --scrape, the page is
+    scraped without loading any GUI or audio modules and the MP3 URLs are
+    printed (or saved with --download).
+    """
+    parser = argparse.ArgumentParser(description="Find and play MP3 files on a website.")
+    parser.add_argument('--scrape', metavar='URL', help="scrape URL for MP3 files instead of opening the player")
+    parser.add_argument('--crawl', action='store_true', help="also search same-site pages linked from URL")
+    parser.add_argument('--json', action='store_true', help="print the MP3 URLs as a JSON list")
+    parser.add_argument('--validate', action='store_true',
+                        help="drop links that are dead or don't serve audio")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="drop copies of the same file found under other URLs")
+    parser.add_argument('--download', metavar='DIR', help="save the MP3 files found into DIR")
+    parser.add_argument('--workers', type=int, default=BULK_WORKERS,
+                        help=f"parallel downloads for --download (default {BULK_WORKERS})")
+    parser.add_argument('--rate-limit', type=int, metavar='KB/S',
+                        help="cap the total download rate (default: unlimited)")
+    parser.add_argument('--host-rate-limit', type=int, metavar='KB/S',
+                        help="cap the download rate from each host (default: unlimited)")
+    parser.add_argument('--trace', metavar='FILE', help="append timing spans to FILE as JSON lines")
+    parser.add_argument('--trace-summary', action='store_true',
+                        help="print a table of where the time went when the app exits")
+    args = parser.parse_args(argv)
+    
+    if args.trace or args.trace_summary:
+        tracer.enable(args.trace, summary=args.trace_summary)
+    if args.rate_limit is not None or args.host_rate_limit is not None:
+        scheduler.set_rate_limits(args.rate_limit and args.rate_limit * 1024,
+                                  args.host_rate_limit and args.host_rate_limit * 1024)
+    
+    if not args.scrape:
+        if args.crawl or args.json or args.download or args.validate or args.dedupe:
+            parser.error("--crawl, --json, --validate, --dedupe and --download need --scrape URL")
+        # Start with URL input UI
+        create_url_input_ui()
+        return 0
+    
+    # Keep stdout for the results; progress and error messages go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        mp3_urls = crawl_mp3_urls(args.scrape) if args.crawl else scrape_mp3_urls(args.scrape)
+        if args.validate:
+            mp3_urls = drop_broken_urls(mp3_urls)
+        if args.dedupe:
+            # Reuse the fingerprints stored by earlier runs and the player
+            try:
+                library = Library()
+                track_info = library.track_info(mp3_urls)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error opening library: {e}")
+                library, track_info = None, {}
+            mp3_urls = drop_duplicate_tracks(mp3_urls, track_info)
+            if library:
+                try:
+                    library.save_track_info(track_info)
+                except sqlite3.Error as e:
+                    print(f"Error saving to library: {e}")
+        if args.download:
+            status = download_all(mp3_urls, args.download, max_workers=args.workers,
+                                  on_status=print_download_status)
+            print(f"Saved {status['saved']} new files to {args.download}, "
+                  f"{status['skipped']} already there, {status['failed']} failed")
+    if args.json:
+        print(json.dumps(mp3_urls, indent=2))
+    elif not args.download:
+        print('\n'.join(mp3_urls))
+    return 0 if mp3_urls else 1
+
 if __name__ == "__main__":
-    # Start with URL input UI
-    create_url_input_ui()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file